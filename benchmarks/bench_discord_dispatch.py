@@ -0,0 +1,70 @@
+"""
+pushes a burst of log lines through discord_log's Sender against a local stand-in for discord
+that rate limits and fails some requests, then checks everything arrived, in order.
+"""
+
+
+import time
+import asyncio
+import fake_qtile
+from fake_discord import FakeDiscord
+
+fake_qtile.install()
+
+from frankentile import discord_log  # noqa: E402
+
+
+CHANNELS = 3
+LINES = 400
+
+
+async def run(name):
+    discord = await FakeDiscord(limit=5, window=0.5, error_rate=0.2).start()
+    sender = discord_log.Sender(api_base=discord.url, max_queue=LINES * CHANNELS)
+    sender.dispatcher.backoff = 0.05
+
+    sent = {}
+    for i in range(LINES):
+        for channel in range(1, CHANNELS + 1):
+            line = f"channel {channel} event {i} " + "x" * (i % 90)
+            sender.put(channel, line)
+            sent.setdefault(str(channel), []).append(line)
+
+    start = time.perf_counter()
+    await sender.send_all()
+    took = time.perf_counter() - start
+    await sender.close()
+    await discord.stop()
+
+    return {
+        "lines": LINES * CHANNELS,
+        "seconds": took,
+        "requests": discord.requests,
+        "rate_limited": discord.rate_limited,
+        "errors": discord.errors,
+        **sender.dispatcher.stats(),
+        "in_order": all(discord.lines(channel) == lines for channel, lines in sent.items()),
+    }
+
+
+async def measure():
+    attach_after = discord_log.ATTACH_AFTER
+    results = {"attachments": await run("attachments")}
+
+    # force every packed message to be posted on its own so the rate limits come into play.
+    discord_log.ATTACH_AFTER = 1000
+    results["messages"] = await run("messages")
+    discord_log.ATTACH_AFTER = attach_after
+
+    return results
+
+
+async def main():
+    for name, res in (await measure()).items():
+        print(f"{name}: {res['lines']} lines over {CHANNELS} channels in {res['seconds']:.2f}s, {res['requests']} "
+              f"requests ({res['rate_limited']} rate limited, {res['errors']} errors), {res['delivered']} delivered, "
+              f"{res['retried']} retried, {res['dropped']} dropped, everything delivered in order: {res['in_order']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,92 @@
+"""
+measures how long logging a new_window/window_closed pair keeps Qtile's event loop busy, compared
+with formatting the json (and asking X for the wm class and pid again) on the hook path. the
+sender has a spool attached like discord_log.init() gives it, so both include spooling the event.
+"""
+
+
+import json
+import time
+import asyncio
+import tempfile
+import fake_qtile
+
+fake_qtile.install()
+
+from frankentile import discord_log  # noqa: E402
+from frankentile.spool import Spool  # noqa: E402
+
+
+EVENTS = 20000
+
+
+async def eager(win):
+    """what the hooks used to do"""
+    for event_type in (discord_log.EventType.new_window, discord_log.EventType.window_closed):
+        payload = {"name": win.name, "wm_class": win.get_wm_class(), "pid": win.get_pid()}
+        text = json.dumps({"timestamp": time.time(), "event_type": event_type, "payload": payload})
+        discord_log.MESSENGER.put(1, text)
+
+
+async def deferred(win):
+    await discord_log.new_window(win)
+    await discord_log.closed_window(win)
+
+
+async def run(name, hooks):
+    windows = [fake_qtile.Window(("term", "Term"), i) for i in range(EVENTS)]
+    sender = discord_log.MESSENGER
+    sender.queue.clear()
+    sender.max_queue = 2 * EVENTS
+
+    with tempfile.TemporaryDirectory() as spool_dir:
+        sender.attach_spool(Spool(spool_dir, dumps=discord_log._dumps))
+
+        start = time.perf_counter()
+        for win in windows:
+            await hooks(win)
+        took = time.perf_counter() - start
+
+        if sender.syncing:
+            await sender.syncing
+
+        sender.spool.close()
+        sender.spool = None
+
+    return {
+        "us_per_event": took / (2 * EVENTS) * 1e6,
+        "x_calls_per_window": sum(w.x_calls for w in windows) / EVENTS,
+    }
+
+
+async def measure():
+    results = {
+        "eager": await run("json on the hook path", eager),
+        "deferred": await run("deferred formatting", deferred),
+    }
+
+    start = time.perf_counter()
+    for _, event, _ in discord_log.MESSENGER.queue:
+        event.format()
+    took = time.perf_counter() - start
+    results["sender_format"] = {
+        "us_per_event": took / (2 * EVENTS) * 1e6,
+        "encoder": "json" if discord_log._dumps is json.dumps else "orjson",
+    }
+    discord_log.MESSENGER.queue.clear()
+
+    return results
+
+
+async def main():
+    results = await measure()
+    print(f"json on the hook path: {results['eager']['us_per_event']:.2f} us per event on the loop (spooled), "
+          f"{results['eager']['x_calls_per_window']:.0f} X calls per window")
+    print(f"deferred formatting: {results['deferred']['us_per_event']:.2f} us per event on the loop (spooled), "
+          f"{results['deferred']['x_calls_per_window']:.0f} X calls per window")
+    print(f"formatting on the sender: {results['sender_format']['us_per_event']:.2f} us per event "
+          f"(encoder: {results['sender_format']['encoder']})")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
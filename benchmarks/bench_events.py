@@ -0,0 +1,95 @@
+"""
+pushes Qtile style events through a multiprocessing queue into broadcast's Broadcaster (the way the
+web api's /events is fed) and measures how long they take to reach many subscribers, and what a
+subscriber that can't keep up loses.
+"""
+
+
+import time
+import asyncio
+import threading
+import multiprocessing
+import fake_qtile
+
+fake_qtile.install()
+
+from frankentile.broadcast import Broadcaster  # noqa: E402
+
+
+SUBSCRIBERS = 50
+EVENTS = 2000
+BUFFER = 64
+
+
+def _percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(int(q * len(samples)), len(samples) - 1)]
+
+
+def _subscriber(events, sub, latencies, received, slow):
+    count = 0
+
+    while count + sub.dropped < EVENTS:
+        for event in events.get(sub, 1):
+            latencies.append(time.perf_counter() - event["sent"])
+            count += 1
+
+        if slow:
+            time.sleep(0.05)
+
+    received.append(count)
+
+
+def run():
+    events = Broadcaster(state_types=("group",), buffer_size=BUFFER)
+    queue = multiprocessing.Queue()
+    events.pump(queue)
+
+    latencies, received, slow_received = [], [], []
+    subs = [events.subscribe() for _ in range(SUBSCRIBERS + 1)]
+    threads = [
+        threading.Thread(target=_subscriber, args=(events, sub, latencies, received, False)) for sub in subs[1:]
+    ]
+    threads.append(threading.Thread(target=_subscriber, args=(events, subs[0], [], slow_received, True)))
+
+    for thread in threads:
+        thread.start()
+
+    start = time.perf_counter()
+    for i in range(EVENTS):
+        queue.put({"type": "group", "group": str(i % 9), "sent": time.perf_counter()})
+        if i % 20 == 0:
+            # Qtile's hooks come in bursts, not one long stream.
+            time.sleep(0.005)
+
+    for thread in threads:
+        thread.join()
+    took = time.perf_counter() - start
+
+    return {
+        "subscribers": SUBSCRIBERS,
+        "events": EVENTS,
+        "deliveries_per_second": sum(received) / took,
+        "p50_ms": _percentile(latencies, 0.5) * 1000,
+        "p95_ms": _percentile(latencies, 0.95) * 1000,
+        "dropped_by_other_subscribers": EVENTS * SUBSCRIBERS - sum(received),
+        "slow_subscriber_received": slow_received[0],
+        "slow_subscriber_dropped": subs[0].dropped,
+    }
+
+
+async def measure():
+    return await asyncio.to_thread(run)
+
+
+async def main():
+    res = await measure()
+    print(f"{res['events']} events to {res['subscribers']} subscribers: p50 {res['p50_ms']:.3f} ms, "
+          f"p95 {res['p95_ms']:.3f} ms, {res['deliveries_per_second']:.0f} deliveries/s, "
+          f"{res['dropped_by_other_subscribers']} dropped by the other subscribers")
+    print(f"slow subscriber: {res['slow_subscriber_received']} received, {res['slow_subscriber_dropped']} dropped "
+          f"(buffer of {BUFFER})")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
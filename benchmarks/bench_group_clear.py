@@ -0,0 +1,86 @@
+"""
+simulates a 30 window layout load into one group and compares clearing the group once per
+group_window_add (the old way) with auto_desk's batched GroupClearer.
+"""
+
+
+import time
+import asyncio
+import fake_qtile
+from fake_auto_desk import FakeAutoDesk
+
+fake_qtile.install()
+
+from frankentile import auto_desk  # noqa: E402
+
+
+WINDOWS = 30
+
+
+async def per_window_clear(group, window):
+    """what clear_group used to do on every group_window_add"""
+    if await auto_desk.should_clear(group.name):
+        pid = window.get_pid()
+        for w in list(group.windows):
+            if w.get_pid() != pid:
+                w.togroup("hidden")
+
+
+async def load_layout(clear):
+    """opens WINDOWS windows of one program in a group that should be cleared"""
+    fake_qtile.reset()
+    group = fake_qtile.Group("code")
+    old = [fake_qtile.Window(("old", "Old"), 1, group=group) for _ in range(5)]
+    new = []
+
+    for i in range(WINDOWS):
+        w = fake_qtile.Window(("term", "Term"), 100, group=group)
+        new.append(w)
+        await clear(group, w)
+
+    return group, old + new
+
+
+async def run(name, clear, settle):
+    desk = await FakeAutoDesk(clears={"code"}).start()
+    auto_desk.CLIENT._path = desk.path
+
+    start = time.perf_counter()
+    group, windows = await load_layout(clear)
+    await settle()
+    took = time.perf_counter() - start
+
+    await desk.stop()
+
+    return {
+        "ms": took * 1000,
+        "auto_desk_requests": desk.requests,
+        "get_pid_calls": sum(w.x_calls for w in windows),
+        "windows_left": len(group.windows),
+    }
+
+
+async def measure():
+    async def nothing():
+        pass
+
+    async def batched(group, window):
+        auto_desk.CLEARER.add(group, window)
+
+    async def flushed():
+        await asyncio.gather(*auto_desk.CLEARER.tasks)
+
+    return {
+        "per_window": await run("per window", per_window_clear, nothing),
+        "batched": await run("batched", batched, flushed),
+    }
+
+
+async def main():
+    for name, res in (await measure()).items():
+        print(f"{name}: {res['ms']:.1f} ms, {res['auto_desk_requests']} auto-desk requests, "
+              f"{res['get_pid_calls']} get_pid calls, {res['windows_left']} windows left in group")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+"""
+renders keybinding cheat sheets for a made up keymap, serially and with a pool of workers, then
+looks the same keymap up again to time the cache. needs cairo.
+"""
+
+
+import os
+import time
+import asyncio
+import tempfile
+from types import SimpleNamespace
+import fake_qtile
+
+fake_qtile.install()
+
+MODIFIERS = ["", "mod4", "mod4-shift", "mod4-control", "mod1"]
+KEYS = "qwertyuiopasdfghjklzxcvbnm1234567890"
+PROCESSES = min(os.cpu_count() or 1, 4)
+
+
+def kb_map():
+    return {
+        modifier: {
+            key: SimpleNamespace(key=key, command=f"{modifier or 'plain'} {key} command", scope="global")
+            for key in KEYS[i:] + KEYS[:i]
+        }
+        for i, modifier in enumerate(MODIFIERS)
+    }
+
+
+def _time(func, *args):
+    start = time.perf_counter()
+    res = func(*args)
+    return time.perf_counter() - start, res
+
+
+async def measure():
+    try:
+        from frankentile import gen_keybinding_img as kb
+    except (ImportError, OSError) as e:
+        return {"skipped": f"could not import gen_keybinding_img: {str(e).splitlines()[0]}"}
+
+    keymap = kb_map()
+    results = {"sheets": len(keymap)}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        kb.cache_dir = tmp
+
+        for n in (1, PROCESSES):
+            jobs = [(modifier, keys, os.path.join(tmp, f"{n}-{kb.img_name(modifier)}")) for modifier, keys in keymap.items()]
+            took, _ = _time(kb.render_sheets, jobs, n)
+            results[f"render_{n}_processes_ms"] = took * 1000
+
+        took, _ = _time(lambda: list(kb.iter_pngs(keymap)))
+        results["cold_cache_ms"] = took * 1000
+
+        # iter_pngs only renders to memory, fill the cache the way make_imgs does.
+        kb.render_sheets([sheet[:3] for sheet in kb._cache_lookup(keymap)])
+
+        took, _ = _time(lambda: list(kb.iter_pngs(keymap)))
+        results["warm_cache_ms"] = took * 1000
+
+    return results
+
+
+async def main():
+    results = await measure()
+
+    if "skipped" in results:
+        print(f"skipped: {results['skipped']}")
+        return
+
+    for name, value in results.items():
+        print(f"{name}: {value:.1f}" if isinstance(value, float) else f"{name}: {value}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+"""
+runs discord_log's Sender the way Qtile does (init_sender in the background, producers putting
+lines as events happen) against a local stand-in for discord, and measures how long a burst takes
+to be delivered and how much of it is dropped when the queue is too small for it.
+"""
+
+
+import time
+import asyncio
+import fake_qtile
+from fake_discord import FakeDiscord
+
+fake_qtile.install()
+
+from frankentile import discord_log  # noqa: E402
+
+
+CHANNELS = 2
+LINES = 2000
+BURSTS = 10
+
+
+async def _drained(sender):
+    while sender.queue or sender.flushing.locked():
+        await asyncio.sleep(0.005)
+
+
+async def run(name, max_queue):
+    discord = await FakeDiscord(limit=5, window=0.5).start()
+    sender = discord_log.Sender(api_base=discord.url, latency=0.01, max_queue=max_queue)
+    task = asyncio.create_task(sender.init_sender())
+
+    start = time.perf_counter()
+    for i in range(LINES):
+        sender.put(1 + i % CHANNELS, f"event {i} " + "x" * (i % 60))
+
+        # events come in bursts, let the loop breathe between them.
+        if i % (LINES // BURSTS) == 0:
+            await asyncio.sleep(0)
+
+    await _drained(sender)
+    took = time.perf_counter() - start
+
+    await sender.close()
+    await task
+    await discord.stop()
+
+    received = sum(len(discord.lines(channel)) for channel in range(1, CHANNELS + 1))
+
+    return {
+        "lines": LINES,
+        "max_queue": max_queue,
+        "seconds": took,
+        "lines_per_second": received / took if took else 0,
+        "received": received,
+        "overflowed": sender.overflowed,
+        "drop_rate": (LINES - received) / LINES,
+        "requests": discord.requests,
+        **sender.dispatcher.stats(),
+    }
+
+
+async def measure():
+    return {
+        "roomy_queue": await run("roomy queue", max_queue=LINES),
+        "small_queue": await run("small queue", max_queue=LINES // 10),
+    }
+
+
+async def main():
+    for name, res in (await measure()).items():
+        print(f"{name}: {res['received']}/{res['lines']} lines delivered in {res['seconds']:.2f}s "
+              f"({res['lines_per_second']:.0f} lines/s) over {res['requests']} requests, max_queue "
+              f"{res['max_queue']}, {res['overflowed']} overflowed, drop rate {res['drop_rate']:.1%}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+"""
+records metrics through the grafana module's hooks, then pushes them to a local stand-in graphite
+receiver and scrapes the /metrics endpoint. reports how many batches (connections) carried how
+many lines, and how long a push and a scrape take.
+"""
+
+
+import time
+import asyncio
+import fake_qtile
+from fake_graphite import FakeGraphite
+
+fake_qtile.install()
+
+from frankentile import grafana  # noqa: E402
+
+
+WINDOWS = 500
+
+
+async def scrape(port):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"GET /metrics HTTP/1.1\r\nHost: localhost\r\n\r\n")
+    data = await reader.read()
+    writer.close()
+    return data.decode("utf-8")
+
+
+async def measure():
+    for i in range(WINDOWS):
+        win = fake_qtile.Window(("term", f"Term{i % 7}"), i)
+        await grafana.window_opened(win)
+        await grafana.group_switched()
+        grafana.histogram("auto_desk_request_seconds").observe(0.0005 * (i % 20), command="auto-move")
+
+    graphite = await FakeGraphite().start()
+    pusher = grafana.Pusher("127.0.0.1", graphite.port, interval=1)
+
+    start = time.perf_counter()
+    await pusher.push()
+    await pusher.push()
+    push_took = (time.perf_counter() - start) / 2
+    await graphite.wait_for(2)
+
+    server = await grafana.serve_metrics("127.0.0.1", 0)
+    start = time.perf_counter()
+    text = await scrape(server.sockets[0].getsockname()[1])
+    scrape_took = time.perf_counter() - start
+    server.close()
+    await graphite.stop()
+
+    opened = [line for line in graphite.batches[0] if ".windows_opened_total." in line]
+
+    return {
+        "graphite": {
+            "batches": len(graphite.batches),
+            "lines": [len(b) for b in graphite.batches],
+            "windows_opened": sum(int(line.split()[1]) for line in opened),
+            "ms_per_push": push_took * 1000,
+        },
+        "scrape": {
+            "lines": len(text.splitlines()),
+            "ok": text.startswith("HTTP/1.1 200"),
+            "ms": scrape_took * 1000,
+        },
+    }
+
+
+async def main():
+    results = await measure()
+    push, scrape = results["graphite"], results["scrape"]
+    print(f"graphite: {push['batches']} batches of {push['lines']} lines, "
+          f"{push['windows_opened']} windows opened counted, {push['ms_per_push']:.2f} ms per push")
+    print(f"scrape: {scrape['lines']} lines, ok: {scrape['ok']}, {scrape['ms']:.2f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
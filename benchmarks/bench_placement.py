@@ -0,0 +1,73 @@
+"""
+opens windows of a handful of programs through auto_desk's open_on hook against a local auto-desk
+and compares how long placing them takes with a cold placement cache (every window asks the
+daemon) and a warm one.
+"""
+
+
+import time
+import asyncio
+import fake_qtile
+from fake_auto_desk import FakeAutoDesk
+
+fake_qtile.install()
+
+from frankentile import auto_desk  # noqa: E402
+
+
+PROGRAMS = [("term", "Term"), ("firefox", "Firefox"), ("code", "Code"), ("spotify", "Spotify"), ("mpv", "mpv")]
+WINDOWS = 200
+
+
+def _percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(int(q * len(samples)), len(samples) - 1)]
+
+
+async def run(name, cold):
+    desk = await FakeAutoDesk(placements={cls: f"group-{i}" for i, (_, cls) in enumerate(PROGRAMS)}).start()
+    auto_desk.CLIENT._path = desk.path
+    auto_desk.PLACEMENTS = auto_desk.PlacementCache()
+    fake_qtile.reset()
+
+    samples = []
+    placed = 0
+    for i in range(WINDOWS):
+        if cold:
+            auto_desk.PLACEMENTS.clear()
+
+        win = fake_qtile.Window(PROGRAMS[i % len(PROGRAMS)], 1000 + i)
+        start = time.perf_counter()
+        await auto_desk.open_on(win)
+        samples.append(time.perf_counter() - start)
+        placed += win.group is not None
+
+    await desk.stop()
+
+    return {
+        "windows": WINDOWS,
+        "placed": placed,
+        "p50_ms": _percentile(samples, 0.5) * 1000,
+        "p95_ms": _percentile(samples, 0.95) * 1000,
+        "total_ms": sum(samples) * 1000,
+        "auto_desk_requests": desk.requests,
+        **auto_desk.PLACEMENTS.stats(),
+    }
+
+
+async def measure():
+    return {
+        "cold": await run("cold cache", cold=True),
+        "warm": await run("warm cache", cold=False),
+    }
+
+
+async def main():
+    for name, res in (await measure()).items():
+        print(f"{name}: {res['placed']}/{res['windows']} windows placed, p50 {res['p50_ms']:.3f} ms, "
+              f"p95 {res['p95_ms']:.3f} ms, {res['auto_desk_requests']} auto-desk requests, "
+              f"{res['hits']} cache hits")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,112 @@
+"""
+sends /focus-on/<group> style commands to a local stand-in for Qtile's IPC server, the way
+InteractiveCommandClient does it (check the group exists, check the command exists, then run it,
+each over a new connection and event loop) and through qtile_ipc's shared client.
+"""
+
+
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import fake_qtile
+from fake_qtile_ipc import FakeQtileIPC
+
+fake_qtile.install()
+
+from frankentile.qtile_ipc import QtileClient  # noqa: E402
+
+
+COMMANDS = 300
+THREADS = 8
+
+
+def _percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(int(q * len(samples)), len(samples) - 1)]
+
+
+async def _async_send(path, msg):
+    """what libqtile.ipc.Client.async_send does"""
+    reader, writer = await asyncio.open_unix_connection(path)
+    writer.write(fake_qtile._IPC.pack(msg))
+    writer.write_eof()
+    data = await reader.read()
+    writer.close()
+    await writer.wait_closed()
+    return fake_qtile._IPC.unpack(data)[0]
+
+
+def interactive_toscreen(path, group):
+    """c.group[group].toscreen() with InteractiveCommandClient: has_item, has_command, then the call"""
+    _, (_, items) = asyncio.run(_async_send(path, ([], "items", ("group",), {}, False)))
+    if group not in items:
+        raise KeyError(group)
+
+    _, commands = asyncio.run(_async_send(path, ([("group", group)], "commands", (), {}, False)))
+    if "toscreen" not in commands:
+        raise KeyError("toscreen")
+
+    return asyncio.run(_async_send(path, ([("group", group)], "toscreen", (), {}, False)))
+
+
+def _run(qtile, send, threads=1):
+    start_requests = qtile.requests
+    samples = []
+
+    def one(i):
+        start = time.perf_counter()
+        send(str(1 + i % 3))
+        samples.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(one, range(COMMANDS)))
+    took = time.perf_counter() - start
+
+    return {
+        "commands": COMMANDS,
+        "threads": threads,
+        "p50_ms": _percentile(samples, 0.5) * 1000,
+        "p95_ms": _percentile(samples, 0.95) * 1000,
+        "commands_per_second": COMMANDS / took,
+        "round_trips_per_command": (qtile.requests - start_requests) / COMMANDS,
+    }
+
+
+def run():
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    qtile = asyncio.run_coroutine_threadsafe(FakeQtileIPC().start(), loop).result()
+    client = QtileClient()
+
+    try:
+        return {
+            "interactive": _run(qtile, lambda group: interactive_toscreen(qtile.path, group)),
+            "shared": _run(qtile, lambda group: client.call([("group", group)], "toscreen")),
+            "shared_threaded": _run(qtile, lambda group: client.call([("group", group)], "toscreen"), THREADS),
+            "healthy": client.check(),
+        }
+    finally:
+        asyncio.run_coroutine_threadsafe(qtile.stop(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+
+
+async def measure():
+    return await asyncio.to_thread(run)
+
+
+async def main():
+    results = await measure()
+
+    for name in ("interactive", "shared", "shared_threaded"):
+        res = results[name]
+        print(f"{name}: {res['commands']} commands on {res['threads']} thread(s), p50 {res['p50_ms']:.3f} ms, "
+              f"p95 {res['p95_ms']:.3f} ms, {res['commands_per_second']:.0f} commands/s, "
+              f"{res['round_trips_per_command']:.0f} round trip(s) per command")
+
+    print(f"health check: {results['healthy']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,86 @@
+"""
+times requests to the web API through flask's test client, so only frankentile's handlers and
+flask itself are measured. /key-binds serves bench_keybinds' made up keymap from an empty cache.
+needs the web API's dependencies (cairo, alsaaudio, playerctl, libtmux).
+"""
+
+
+import time
+import asyncio
+import tempfile
+import fake_qtile
+from bench_keybinds import kb_map
+
+fake_qtile.install()
+
+REQUESTS = 500
+
+
+def _percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(int(q * len(samples)), len(samples) - 1)]
+
+
+def _run(client, path, requests=REQUESTS, headers=None, json=None):
+    samples = []
+    statuses = set()
+
+    for _ in range(requests):
+        start = time.perf_counter()
+        if json is None:
+            res = client.get(path, headers=headers)
+        else:
+            res = client.post(path, headers=headers, json=json)
+        res.get_data()
+        samples.append(time.perf_counter() - start)
+        statuses.add(res.status_code)
+
+    return {
+        "requests": requests,
+        "statuses": sorted(statuses),
+        "p50_ms": _percentile(samples, 0.5) * 1000,
+        "p95_ms": _percentile(samples, 0.95) * 1000,
+        "requests_per_second": requests / sum(samples),
+    }
+
+
+async def measure():
+    try:
+        from frankentile import web
+    except (ImportError, ValueError, OSError) as e:
+        return {"skipped": f"could not import web: {str(e).splitlines()[0]}"}
+
+    from frankentile import gen_keybinding_img
+
+    keymap = kb_map()
+    web.get_kb_map = lambda config_path: keymap
+    client = web.app.test_client()
+    etag = gen_keybinding_img.keymap_digest(keymap)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        gen_keybinding_img.cache_dir = tmp
+
+        return {
+            "metrics": _run(client, "/metrics"),
+            "not_found": _run(client, "/no-such-route"),
+            "key_binds": _run(client, "/key-binds", requests=5),
+            "key_binds_not_modified": _run(client, "/key-binds", headers={"If-None-Match": f'"{etag}"'}),
+            # four steps in one request, compare with four times metrics' p50.
+            "batch_of_4": _run(client, "/batch", json=["/metrics", ["/metrics", "/metrics"], "/metrics"]),
+        }
+
+
+async def main():
+    results = await measure()
+
+    if "skipped" in results:
+        print(f"skipped: {results['skipped']}")
+        return
+
+    for name, res in results.items():
+        print(f"{name}: {res['requests']} requests, statuses {res['statuses']}, p50 {res['p50_ms']:.3f} ms, "
+              f"p95 {res['p95_ms']:.3f} ms, {res['requests_per_second']:.0f} requests/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,141 @@
+"""
+a local load generator for the web API's serving backends. a few clients keep a slow endpoint
+(standing in for /key-binds or /tmux/<layout>) busy while others hit a fast one (standing in for
+/volume/up), and the fast endpoint's latency is measured per backend.
+"""
+
+
+import time
+import asyncio
+import logging
+import threading
+import http.client
+import importlib.util
+import fake_qtile
+from flask import Flask
+
+fake_qtile.install()
+
+from frankentile import serve  # noqa: E402
+
+# werkzeug logs every request, that's not what's being measured.
+logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+
+SLOW_CLIENTS = 4
+FAST_CLIENTS = 4
+FAST_REQUESTS = 20
+SLOW_SECONDS = 0.2
+WORKERS = 8
+
+
+def make_app():
+    app = Flask("bench")
+
+    @app.route("/slow")
+    def slow():
+        time.sleep(SLOW_SECONDS)
+        return "done"
+
+    @app.route("/fast")
+    def fast():
+        return "volume adjusted correctly"
+
+    return app
+
+
+def _percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(int(q * len(samples)), len(samples) - 1)]
+
+
+def _client(port, path, stop, samples, errors, requests=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    done = 0
+
+    while not stop.is_set() and (requests is None or done < requests):
+        start = time.perf_counter()
+
+        try:
+            conn.request("GET", path)
+            conn.getresponse().read()
+        except (OSError, http.client.HTTPException):
+            errors.append(path)
+            conn.close()
+        else:
+            samples.append(time.perf_counter() - start)
+
+        done += 1
+
+    conn.close()
+
+
+def run(backend):
+    server = serve.make_server(make_app(), "127.0.0.1", 0, backend, workers=WORKERS)
+    port = server.server_port
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    stop = threading.Event()
+    slow, fast, errors = [], [], []
+    slow_clients = [
+        threading.Thread(target=_client, args=(port, "/slow", stop, slow, errors)) for _ in range(SLOW_CLIENTS)
+    ]
+    fast_clients = [
+        threading.Thread(target=_client, args=(port, "/fast", stop, fast, errors, FAST_REQUESTS))
+        for _ in range(FAST_CLIENTS)
+    ]
+
+    for client in slow_clients:
+        client.start()
+    # let the slow requests get in first, like a /key-binds render that's already running.
+    time.sleep(0.05)
+
+    start = time.perf_counter()
+    for client in fast_clients:
+        client.start()
+    for client in fast_clients:
+        client.join()
+    took = time.perf_counter() - start
+
+    stop.set()
+    for client in slow_clients:
+        client.join()
+    server.shutdown()
+    server.server_close()
+
+    return {
+        "fast_requests": len(fast),
+        "fast_p50_ms": _percentile(fast, 0.5) * 1000,
+        "fast_p95_ms": _percentile(fast, 0.95) * 1000,
+        "fast_requests_per_second": len(fast) / took,
+        "slow_requests": len(slow),
+        "errors": len(errors),
+    }
+
+
+async def measure():
+    results = {}
+
+    for backend in serve.BACKENDS:
+        if backend == "waitress" and importlib.util.find_spec("waitress") is None:
+            results[backend] = {"skipped": "waitress is not installed"}
+            continue
+
+        results[backend] = await asyncio.to_thread(run, backend)
+
+    return results
+
+
+async def main():
+    for backend, res in (await measure()).items():
+        if "skipped" in res:
+            print(f"{backend}: skipped, {res['skipped']}")
+            continue
+
+        print(f"{backend}: fast endpoint p50 {res['fast_p50_ms']:.2f} ms, p95 {res['fast_p95_ms']:.2f} ms, "
+              f"{res['fast_requests_per_second']:.0f} requests/s while {SLOW_CLIENTS} clients kept a "
+              f"{SLOW_SECONDS}s endpoint busy ({res['slow_requests']} slow requests, {res['errors']} errors)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
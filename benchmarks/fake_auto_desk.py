@@ -0,0 +1,58 @@
+"""
+a stand-in for the auto-desk daemon. speaks the same protocol over a UNIX socket: read the request
+until the client half closes, answer with an error code byte, a separator, and the payload.
+"""
+
+
+import os
+import asyncio
+import tempfile
+
+
+class FakeAutoDesk:
+    def __init__(self, placements=None, clears=None, latency=0.001):
+        """
+        placements maps a wm class name to the group it goes to, clears is the set of groups
+        should-clear answers true for, latency is how long each answer takes.
+        """
+        self.placements = placements if placements else {}
+        self.clears = clears if clears else set()
+        self.latency = latency
+        self.requests = 0
+        self.path = os.path.join(tempfile.mkdtemp(), "auto-desk.sock")
+        self.server = None
+
+    def answer(self, message):
+        cmd, *args = message.split(" ")
+
+        if cmd == "auto-move":
+            return self.placements.get(args[1], "")
+        if cmd == "should-clear":
+            return "true" if args[0] in self.clears else "false"
+        if cmd == "load-layout":
+            return f"loaded {args[0]}"
+
+        return None
+
+    async def _handle(self, reader, writer):
+        message = (await reader.read()).decode("utf-8")
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        res = self.answer(message)
+
+        if res is None:
+            writer.write(b"\x01 unknown command")
+        else:
+            writer.write(b"\x00 " + res.encode("utf-8"))
+
+        await writer.drain()
+        writer.close()
+
+    async def start(self):
+        self.server = await asyncio.start_unix_server(self._handle, path=self.path)
+        return self
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+        os.remove(self.path)
@@ -0,0 +1,103 @@
+"""
+a local stand-in for the parts of discord's HTTP API that frankentile uses. it rate limits each
+channel like discord does and can fail a share of requests with 5xxs.
+"""
+
+
+import time
+import random
+from aiohttp import web
+
+
+class FakeDiscord:
+    def __init__(self, limit=5, window=1.0, error_rate=0.0, seed=0, rate_limit_headers=True, missing=()):
+        """
+        every channel accepts limit messages per window seconds and answers the rest with 429s.
+        error_rate is the share of requests that get a 502. without rate_limit_headers successful
+        responses don't say how much of the limit is left, so clients only find out from the 429s.
+        the channels in missing answer with a 404.
+        """
+        self.limit = limit
+        self.window = window
+        self.error_rate = error_rate
+        self.rate_limit_headers = rate_limit_headers
+        self.missing = {str(channel) for channel in missing}
+        self.random = random.Random(seed)
+        self.buckets = {}
+        self.messages = {}
+        self.requests = 0
+        self.rate_limited = 0
+        self.errors = 0
+        self.runner = None
+        self.url = None
+
+    def _bucket(self, channel):
+        now = time.monotonic()
+        used, reset_at = self.buckets.get(channel, (0, now + self.window))
+
+        if now >= reset_at:
+            used, reset_at = 0, now + self.window
+
+        return used, reset_at
+
+    async def create_message(self, request):
+        channel = request.match_info["channel"]
+        self.requests += 1
+
+        if channel in self.missing:
+            return web.json_response({"message": "Unknown Channel", "code": 10003}, status=404)
+
+        used, reset_at = self._bucket(channel)
+        reset_after = max(reset_at - time.monotonic(), 0)
+
+        if used >= self.limit:
+            self.rate_limited += 1
+            return web.json_response(
+                {"message": "You are being rate limited.", "retry_after": reset_after, "global": False},
+                status=429,
+                headers={"Retry-After": f"{reset_after:.3f}", "X-RateLimit-Bucket": f"bucket-{channel}"},
+            )
+
+        if self.random.random() < self.error_rate:
+            self.errors += 1
+            return web.Response(status=502, text="bad gateway")
+
+        self.buckets[channel] = (used + 1, reset_at)
+
+        if request.content_type == "application/json":
+            content = (await request.json())["content"]
+        else:
+            form = await request.post()
+            content = form["files[0]"].file.read().decode("utf-8")
+
+        self.messages.setdefault(channel, []).append(content)
+
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(self.limit - used - 1),
+            "X-RateLimit-Reset-After": f"{reset_after:.3f}",
+            "X-RateLimit-Bucket": f"bucket-{channel}",
+        }
+
+        return web.json_response(
+            {"id": str(self.requests), "content": content}, headers=headers if self.rate_limit_headers else None
+        )
+
+    async def start(self, port=0):
+        app = web.Application()
+        app.router.add_post("/api/v10/channels/{channel}/messages", self.create_message)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}/api/v10"
+
+        return self
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+    def lines(self, channel):
+        """every log line the channel received, in the order they arrived"""
+        return [line for message in self.messages.get(str(channel), []) for line in message.split("\n")]
@@ -0,0 +1,36 @@
+"""
+a local stand-in for a graphite server's plaintext receiver.
+"""
+
+
+import time
+import asyncio
+
+
+class FakeGraphite:
+    """accepts graphite plaintext connections and keeps the lines of each one as a batch"""
+    def __init__(self):
+        self.batches = []
+        self.server = None
+        self.port = None
+
+    async def _handle(self, reader, writer):
+        data = await reader.read()
+        self.batches.append(data.decode("utf-8").splitlines())
+        writer.close()
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def wait_for(self, batches, timeout=1.0):
+        """waits (up to timeout seconds) until at least batches batches have been received"""
+        deadline = time.monotonic() + timeout
+
+        while len(self.batches) < batches and time.monotonic() < deadline:
+            await asyncio.sleep(0.005)
@@ -0,0 +1,183 @@
+"""
+a stand-in for the parts of libqtile that frankentile touches, so the benchmarks can run without a
+running Qtile (or Qtile installed).
+"""
+
+
+import os
+import sys
+import types
+import struct
+import marshal
+import logging
+import itertools
+
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+_wids = itertools.count(1)
+
+
+class Window:
+    """a fake client window. counts the calls that would be X round trips in Qtile."""
+    def __init__(self, wm_class, pid, name=None, group=None):
+        self.wid = next(_wids)
+        self.name = name if name else wm_class[1]
+        self.wm_class = wm_class
+        self.pid = pid
+        self.group = None
+        self.x_calls = 0
+
+        if group:
+            group.add(self)
+
+    def get_pid(self):
+        self.x_calls += 1
+        return self.pid
+
+    def get_wm_class(self):
+        self.x_calls += 1
+        return self.wm_class
+
+    def togroup(self, name):
+        GROUPS.setdefault(name, Group(name)).add(self)
+
+
+class Group:
+    def __init__(self, name):
+        self.name = name
+        self.windows = []
+
+    def add(self, window):
+        if window.group:
+            window.group.windows.remove(window)
+
+        window.group = self
+        self.windows.append(window)
+
+
+GROUPS = {}
+
+
+def reset():
+    GROUPS.clear()
+
+
+class _Subscribe:
+    """records hook subscriptions instead of wiring them into Qtile"""
+    def __init__(self):
+        self.hooks = {}
+
+    def __getattr__(self, name):
+        def subscribe(func):
+            self.hooks.setdefault(name, []).append(func)
+            return func
+
+        return subscribe
+
+
+class _InteractiveCommandClient:
+    def __getattr__(self, name):
+        raise RuntimeError("the fake libqtile has no running Qtile to talk to")
+
+
+class _Qtile:
+    """stands in for libqtile.qtile, the running Qtile instance"""
+    def __init__(self):
+        self.current_group = Group("1")
+
+
+class _Node:
+    """a command graph node, enough of libqtile.command.graph to build IPC messages"""
+    children = ["bar", "group", "layout", "screen", "widget", "window", "core"]
+
+    def __init__(self, selectors=()):
+        self.selectors = list(selectors)
+
+    def navigate(self, name, selector):
+        if name not in self.children:
+            raise KeyError(f"Given node is not an object: {name}")
+
+        return _Node(self.selectors + [(name, selector)])
+
+    def call(self, name, lifted=False):
+        return types.SimpleNamespace(name=name, parent=self, lifted=lifted)
+
+
+class _IPC:
+    """packs messages the way libqtile.ipc does (marshal with a length header)"""
+    @staticmethod
+    def pack(msg, *, is_json=False):
+        data = marshal.dumps(msg)
+        return struct.pack("!L", len(data)) + data
+
+    @staticmethod
+    def unpack(data, *, is_json=None):
+        return marshal.loads(data[4:4 + struct.unpack("!L", data[:4])[0]]), False
+
+
+def install():
+    """
+    puts the fake libqtile in sys.modules and makes frankentile importable without running its
+    __init__ (which pulls in every optional dependency).
+    """
+    if "libqtile" in sys.modules:
+        return
+
+    libqtile = types.ModuleType("libqtile")
+    hook = types.ModuleType("libqtile.hook")
+    hook.subscribe = _Subscribe()
+    log_utils = types.ModuleType("libqtile.log_utils")
+    log_utils.logger = logging.getLogger("libqtile")
+    # frankentile logs every window it moves, keep that out of the results.
+    log_utils.logger.addHandler(logging.NullHandler())
+    log_utils.logger.propagate = False
+    command = types.ModuleType("libqtile.command")
+    client = types.ModuleType("libqtile.command.client")
+    client.InteractiveCommandClient = _InteractiveCommandClient
+    base = types.ModuleType("libqtile.command.base")
+    base.SelectError = type("SelectError", (Exception,), {})
+    base.CommandError = type("CommandError", (Exception,), {})
+    base.CommandException = type("CommandException", (Exception,), {})
+    graph = types.ModuleType("libqtile.command.graph")
+    graph.CommandGraphRoot = _Node
+    interface = types.ModuleType("libqtile.command.interface")
+    interface.SUCCESS, interface.ERROR, interface.EXCEPTION = 0, 1, 2
+    ipc = types.ModuleType("libqtile.ipc")
+    ipc.IPCError = type("IPCError", (Exception,), {})
+    ipc._IPC = _IPC
+    # fake_qtile_ipc.FakeQtileIPC points this at its socket.
+    ipc.SOCKFILE = None
+    ipc.find_sockfile = lambda display=None: ipc.SOCKFILE
+
+    libqtile.qtile = _Qtile()
+    libqtile.hook = hook
+    libqtile.log_utils = log_utils
+    libqtile.command = command
+    libqtile.ipc = ipc
+    command.client = client
+    command.base = base
+    command.graph = graph
+    command.interface = interface
+
+    sys.modules.update({
+        "libqtile": libqtile,
+        "libqtile.hook": hook,
+        "libqtile.log_utils": log_utils,
+        "libqtile.command": command,
+        "libqtile.command.client": client,
+        "libqtile.command.base": base,
+        "libqtile.command.graph": graph,
+        "libqtile.command.interface": interface,
+        "libqtile.ipc": ipc,
+    })
+
+    frankentile = types.ModuleType("frankentile")
+    frankentile.__path__ = [os.path.join(ROOT, "frankentile")]
+    frankentile.WALLPAPER_PATH = os.path.expanduser("~/.config/qtile/wallpaper")
+    sys.modules.setdefault("frankentile", frankentile)
+
+    # frankentile._discord reads ~/.config/qtile/discord.toml on import.
+    _discord = types.ModuleType("frankentile._discord")
+    _discord.config = {"discord": {"token": "fake-token", "log-channel": 1, "admins": []}}
+    _discord.token = "fake-token"
+    sys.modules.setdefault("frankentile._discord", _discord)
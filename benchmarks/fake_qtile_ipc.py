@@ -0,0 +1,61 @@
+"""
+a stand-in for Qtile's IPC server. speaks the same protocol over a UNIX socket: read a packed
+(selectors, command, args, kwargs, lifted) message until the client half closes, answer with a
+packed (status, result) pair.
+"""
+
+
+import os
+import asyncio
+import tempfile
+import fake_qtile
+
+SUCCESS, ERROR = 0, 1
+COMMANDS = ["commands", "items", "status", "toscreen", "togroup", "reload_config"]
+
+
+class FakeQtileIPC:
+    def __init__(self, groups=("1", "2", "3"), latency=0.0002):
+        """groups are the groups that exist, latency is how long Qtile takes to run each command"""
+        self.groups = list(groups)
+        self.latency = latency
+        self.requests = 0
+        self.path = os.path.join(tempfile.mkdtemp(), "qtile.sock")
+        self.server = None
+
+    def answer(self, selectors, name, args):
+        for object_type, selector in selectors:
+            if object_type == "group" and selector is not None and selector not in self.groups:
+                return ERROR, f"No object {object_type}[{selector}]"
+
+        if name == "commands":
+            return SUCCESS, COMMANDS
+        if name == "items":
+            return SUCCESS, (True, self.groups) if args[0] == "group" else (True, [])
+        if name == "status":
+            return SUCCESS, "OK"
+        if name in COMMANDS:
+            return SUCCESS, None
+
+        return ERROR, f"No such command {name}"
+
+    async def _handle(self, reader, writer):
+        (selectors, name, args, _kwargs, _lifted), _ = fake_qtile._IPC.unpack(await reader.read())
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        writer.write(fake_qtile._IPC.pack(self.answer(selectors, name, args)))
+        writer.write_eof()
+        await writer.drain()
+        writer.close()
+
+    async def start(self):
+        import libqtile.ipc
+
+        self.server = await asyncio.start_unix_server(self._handle, path=self.path)
+        libqtile.ipc.SOCKFILE = self.path
+        return self
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+        os.remove(self.path)
@@ -0,0 +1,92 @@
+"""
+runs every benchmark (or the ones named on the command line) and writes their results as json, so
+runs from different releases can be diffed.
+
+    python benchmarks/run.py -o results.json
+    python benchmarks/run.py placement log_throughput
+"""
+
+
+import os
+import sys
+import json
+import time
+import asyncio
+import platform
+import argparse
+import importlib
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fake_qtile  # noqa: E402
+
+BENCHMARKS = [
+    "placement",
+    "group_clear",
+    "event_overhead",
+    "discord_dispatch",
+    "log_throughput",
+    "metrics",
+    "keybinds",
+    "web",
+    "web_load",
+    "qtile_ipc",
+    "events",
+]
+
+
+def version():
+    with open(os.path.join(fake_qtile.ROOT, "pyproject.toml")) as f:
+        for line in f:
+            if line.startswith("version"):
+                return line.split("=", 1)[1].strip().strip('"')
+
+    return None
+
+
+def run(names):
+    results = {}
+
+    for name in names:
+        print(f"running {name}...", file=sys.stderr)
+        start = time.perf_counter()
+
+        try:
+            module = importlib.import_module(f"bench_{name}")
+            results[name] = asyncio.run(module.measure())
+        except Exception as e:
+            results[name] = {"error": f"{type(e).__name__}: {e}"}
+
+        print(f"  done in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="runs frankentile's benchmarks")
+    parser.add_argument("names", nargs="*", help=f"benchmarks to run, any of {', '.join(BENCHMARKS)} (default: all)")
+    parser.add_argument("-o", "--output", help="where to write the results (default: stdout)")
+    args = parser.parse_args()
+
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+
+    report = {
+        "frankentile_version": version(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.time(),
+        "results": run(args.names if args.names else BENCHMARKS),
+    }
+    data = json.dumps(report, indent=2)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(data + "\n")
+    else:
+        print(data)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,28 +6,100 @@
 from libqtile.command.client import InteractiveCommandClient
 from libqtile.log_utils import logger
 from libqtile import hook
-from socket import socket, AF_UNIX, SOCK_STREAM
+from .auto_desk_api import CLIENT, layout_stamp
+from . import instrument
+from . import grafana
+from collections import OrderedDict
+import asyncio
+import time
 
 
 QTILE_CLIENT = InteractiveCommandClient()
-NEW_CLIENT_PIDs = set()
-PATH = "/tmp/desktop-automater"
+# how long a hook waits on auto-desk before giving up on it
+TIMEOUT = 1.0
+DEDUP = grafana.counter(
+    "hook_dedup_total", "window hook calls handled, suppressed as duplicates, and forgotten (expired or evicted)"
+)
+PLACEMENT_CACHE = grafana.counter("placement_cache_total", "placement cache hits, misses, and invalidations")
 
 
-def _open_on(client):
-    """used to move windows when they open""" 
-    pid = client.get_pid()
+class HookDedup:
+    """
+    remembers the windows _open_on has already handled, keyed by window id and pid. most windows
+    fire both client_new and client_managed, so the second call for a window is suppressed. windows
+    that share a pid (browser or electron child windows) have their own window ids and are each
+    handled once. entries expire after ttl seconds and at most max_size are kept, so windows that
+    only ever fire one of the hooks don't pile up.
+    """
+    def __init__(self, ttl=30, max_size=512):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.seen = OrderedDict()
+        self.handled = 0
+        self.suppressed = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def _prune(self, now):
+        while self.seen:
+            key, added = next(iter(self.seen.items()))
+
+            if now - added <= self.ttl:
+                break
+
+            del self.seen[key]
+            self.expired += 1
+            DEDUP.inc(result="expired")
+
+    def first(self, key):
+        """returns True if key hasn't been seen in the last ttl seconds and records it"""
+        now = time.monotonic()
+        self._prune(now)
+
+        if key in self.seen:
+            self.suppressed += 1
+            DEDUP.inc(result="suppressed")
+            return False
+
+        self.seen[key] = now
+        self.handled += 1
+        DEDUP.inc(result="handled")
+
+        while len(self.seen) > self.max_size:
+            self.seen.popitem(last=False)
+            self.evicted += 1
+            DEDUP.inc(result="evicted")
 
+        return True
+
+    def stats(self):
+        """
+        returns how many hook calls were handled and suppressed as duplicates. the same counts are
+        exported as grafana's hook_dedup_total.
+        """
+        return {
+            "handled": self.handled,
+            "suppressed": self.suppressed,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "size": len(self.seen),
+        }
+
+
+NEW_CLIENTS = HookDedup()
+
+
+async def _open_on(client):
+    """used to move windows when they open"""
     # this function gets called twice per window opening.
     # bellow stops this function from moving windows that have already been moved.
-    if pid not in NEW_CLIENT_PIDs:
-        NEW_CLIENT_PIDs.add(pid)
-        move_window(client)
-    else:
-        NEW_CLIENT_PIDs.remove(pid)
+    instrument.count("x")
+    if NEW_CLIENTS.first((client.wid, client.get_pid())):
+        await move_window(client)
 
 
 # @hook.subscribe.client_managed
+@instrument.timed
 async def open_on_backup(client):
     """
     used to move windows when the program sets its WM_CLASS after its managed (ie, after its registered)
@@ -36,61 +108,200 @@ async def open_on_backup(client):
     this a back up for open_on().
     """
     # logger.warning("new client (from backup function)")
-    _open_on(client)
+    await _open_on(client)
 
 
 # @hook.subscribe.client_new
+@instrument.timed
 async def open_on(client):
     """moves windows when they register"""
     # logger.warning("new client")
-    _open_on(client)
+    await _open_on(client)
+
+
+class GroupClearer:
+    """
+    batches group clearing. group_window_add events for a group that arrive within delay seconds
+    of each other (or while auto-desk is being asked about the group) are coalesced, auto-desk is
+    asked once whether the group should be cleared, and every window that wasn't part of the batch
+    is moved to the hidden group in a single pass.
+    """
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.pending = {}
+        self.tasks = set()
+
+    def add(self, group, window):
+        """queues window, which was just added to group"""
+        batch = self.pending.get(group.name)
+
+        if batch is None:
+            batch = self.pending[group.name] = (group, set())
+            task = asyncio.create_task(self._flush_later(group.name))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+        instrument.count("x")
+        batch[1].add(window.get_pid())
+
+    async def _flush_later(self, name):
+        await asyncio.sleep(self.delay)
+        await self.flush(name)
+
+    async def flush(self, name):
+        if name not in self.pending:
+            return
+
+        try:
+            clear = await should_clear(name)
+        finally:
+            # the batch stays pending while auto-desk is asked, so windows added to the group in
+            # the meantime join it (and are kept) instead of starting a batch that clears this one.
+            group, pids = self.pending.pop(name)
+
+        if not clear:
+            return
+
+        logger.debug(f"clearing group {name}")
+        # togroup removes the window from group.windows, so iterate over a copy.
+        for w in list(group.windows):
+            instrument.count("x")
+            if w.get_pid() not in pids:
+                w.togroup("hidden")
+
+
+CLEARER = GroupClearer()
 
 
 # @hook.subscribe.group_window_add
+@instrument.timed
 async def clear_group(group, window):
     # logger.warning(f"clearing group \"{group.name}\"")
-    clearing = should_clear(group.name)
-    if clearing:
-        logger.debug(f"clearing group {group.name}")
-        pid = window.get_pid()
-        for w in group.windows:
-            if w.get_pid() != pid:
-                w.togroup("hidden")
+    CLEARER.add(group, window)
 
 
-def get_location(wm_class):
+class PlacementCache:
+    """
+    remembers where auto-desk placed each (instance, class) pair so opening the same program again
+    doesn't need a round trip to the daemon. entries expire after ttl seconds, the least recently
+    used ones are dropped past max_size, and everything is dropped when auto_desk_api.set_layout
+    marks a layout change.
+    """
+    MISS = object()
+
+    def __init__(self, ttl=300, max_size=256):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.layout_stamp = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _check_layout(self):
+        stamp = layout_stamp()
+
+        if stamp != self.layout_stamp:
+            self.layout_stamp = stamp
+            self.clear()
+
+    def get(self, key):
+        """returns the cached location for key, or PlacementCache.MISS"""
+        self._check_layout()
+        entry = self.entries.get(key)
+
+        if entry is None or time.monotonic() - entry[0] > self.ttl:
+            self.misses += 1
+            PLACEMENT_CACHE.inc(result="miss")
+            return self.MISS
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        PLACEMENT_CACHE.inc(result="hit")
+
+        return entry[1]
+
+    def put(self, key, location):
+        self.entries[key] = (time.monotonic(), location)
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        if self.entries:
+            self.invalidations += 1
+            PLACEMENT_CACHE.inc(result="invalidation")
+
+        self.entries.clear()
+
+    def stats(self):
+        """
+        returns the hit/miss counters, useful when tuning ttl and max_size. they are exported as
+        grafana's placement_cache_total too.
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "size": len(self.entries),
+        }
+
+
+PLACEMENTS = PlacementCache()
+
+
+async def get_location(wm_class):
+    key = (wm_class[0], wm_class[1])
+    location = PLACEMENTS.get(key)
+
+    if location is not PlacementCache.MISS:
+        return location
+
     message = f"auto-move {wm_class[0]} {wm_class[1]}"
-    return send_auto_desk(message)
+    ok, location = await _send_auto_desk(message)
+
+    if ok:
+        PLACEMENTS.put(key, location)
+
+    return location
 
 
-def should_clear(group):
+async def should_clear(group):
     message = f"should-clear {group}"
-    res = send_auto_desk(message)
+    res = await send_auto_desk(message)
     logger.debug(f"should-clear res: '{res}'")
     return res == "true"
 
 
-def send_auto_desk(message):
-    """sends data to auto-desk and returns the response"""
+async def _send_auto_desk(message):
+    """
+    sends data to auto-desk and returns (ok, response). ok is False if auto-desk couldn't be reached
+    or answered with an error code. never blocks the event loop, gives up after TIMEOUT seconds.
+    """
     location = None
 
-    with socket(AF_UNIX, SOCK_STREAM) as s:
-        s.settimeout(10)
-        try:
-            s.connect(PATH)
-        except FileNotFoundError:
-            pass
-        except TimeoutError:
-            pass
-        else:
-            s.send(bytes(message, "utf-8"))
-            s.shutdown(1)  # tells the server im done sending data and it can reply now.
-            res = s.recv(1024)
-            ec = res[0]
-            if len(res) >= 3:
-                location = res[2:].decode('utf-8')
-            if ec:
-                logger.error(f"got error code from auto-desk on message '{message}'.")
+    try:
+        res = await CLIENT.async_request(message, TIMEOUT)
+    except (OSError, asyncio.TimeoutError) as e:
+        logger.debug(f"could not reach auto-desk on message '{message}'. got error: {e}")
+        return False, location
+
+    if not res:
+        return False, location
+
+    ec = res[0]
+    if len(res) >= 3:
+        location = res[2:].decode('utf-8')
+    if ec:
+        logger.error(f"got error code from auto-desk on message '{message}'.")
+
+    return not ec, location
+
+
+async def send_auto_desk(message):
+    """sends data to auto-desk and returns the response"""
+    _, location = await _send_auto_desk(message)
 
     return location
 
@@ -111,10 +322,11 @@ def clear_desktop(group):
         logger.info(f"not clearing group '{group}'")            
 
 
-def move_window(c):
+async def move_window(c):
     logger.warn(f"moving window")
+    instrument.count("x")
     wm_class = c.get_wm_class()
-    location = get_location(wm_class)
+    location = await get_location(wm_class)
     logger.warn(f"moving to location, '{location}'")
     # clear = should_clear(location)
     # if clear:
@@ -5,6 +5,10 @@ a simple api for interacting with auto-desk
 
 from os.path import expanduser
 import socket
+import asyncio
+import difflib
+from . import grafana
+from . import instrument
 import tomllib
 import os
 
@@ -12,46 +16,207 @@ import os
 HOME = expanduser("~")
 _CONF_FILE = f"{HOME}/.config/auto-desk/config.toml"
 _LAYOUT_DIR = f"{HOME}/.config/auto-desk/layouts"
+DEFAULT_SOCKET = "/tmp/desktop-automater"
+LAYOUT_STAMP = "/tmp/frankentile-auto-desk-layout"
+
+
+_CONFIG_CACHE = {}
 
 
 def configs():
-    with open(_CONF_FILE, "rb") as f:
-        data = tomllib.load(f)
-        return data
+    """returns auto-desk's config. the file is only parsed again after it changes."""
+    mtime = os.stat(_CONF_FILE).st_mtime_ns
+
+    if _CONFIG_CACHE.get("mtime") != mtime:
+        with open(_CONF_FILE, "rb") as f:
+            _CONFIG_CACHE["data"] = tomllib.load(f)
+
+        _CONFIG_CACHE["mtime"] = mtime
+
+    return _CONFIG_CACHE["data"]
+
+
+SOCKET_LATENCY = grafana.histogram("auto_desk_request_seconds", "auto-desk socket round trip time")
+
+
+class AutoDeskClient:
+    """
+    a client for auto-desk's unix socket. auto_desk and auto_desk_api share one instance.
+
+    auto-desk reads a request until the client half closes the socket and answers on the same
+    connection, so every request needs a connection of its own. this keeps the socket path resolved
+    between requests, reads the whole response (not just the first 1024 bytes), and re-resolves the
+    path and tries once more if the daemon can't be reached.
+    """
+    def __init__(self, path=None, timeout=2.0, max_in_flight=16):
+        self._path = path
+        self.timeout = timeout
+        self.max_in_flight = max_in_flight
+        self._slots = None
+
+    @property
+    def path(self):
+        if self._path is None:
+            try:
+                self._path = configs().get("server").get("listen_socket")
+            except (OSError, AttributeError):
+                self._path = DEFAULT_SOCKET
+
+        return self._path
+
+    def _request(self, payload):
+        instrument.count("socket")
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.settimeout(self.timeout)
+            s.connect(self.path)
+            s.sendall(payload)
+            s.shutdown(socket.SHUT_WR)
+
+            chunks = []
+            while chunk := s.recv(4096):
+                chunks.append(chunk)
+
+            return b"".join(chunks)
+
+    def request(self, message):
+        """sends message to auto-desk and returns the raw response. raises OSError if it can't."""
+        payload = message.encode("utf-8")
+
+        with SOCKET_LATENCY.time(command=message.split(" ", 1)[0]):
+            try:
+                return self._request(payload)
+            except (FileNotFoundError, ConnectionRefusedError):
+                # the daemon may have been restarted on a different socket.
+                self._path = None
+                return self._request(payload)
+
+
+    async def _async_request(self, payload):
+        instrument.count("socket")
+        reader, writer = await asyncio.open_unix_connection(self.path)
+
+        try:
+            writer.write(payload)
+            writer.write_eof()
+            await writer.drain()
+
+            return await reader.read()
+        finally:
+            writer.close()
+
+    async def async_request(self, message, timeout=None):
+        """
+        the asyncio version of request. the whole exchange has to finish within timeout seconds
+        (defaults to self.timeout) or asyncio.TimeoutError is raised. cancelling the calling task
+        closes the connection.
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_in_flight)
+
+        payload = message.encode("utf-8")
+
+        async with self._slots:
+            with SOCKET_LATENCY.time(command=message.split(" ", 1)[0]):
+                try:
+                    return await asyncio.wait_for(self._async_request(payload), timeout or self.timeout)
+                except (FileNotFoundError, ConnectionRefusedError):
+                    self._path = None
+                    return await asyncio.wait_for(self._async_request(payload), timeout or self.timeout)
+
+
+CLIENT = AutoDeskClient()
 
 
 def send(payload):
-    path = configs().get("server").get("listen_socket")
+    return CLIENT.request(payload).decode('utf-8')
 
-    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
-        s.connect(path)
-        s.send(payload.encode("ascii"))
 
-        s.shutdown(1)
-        res = s.recv(1024).decode('utf-8')
+def layout_stamp():
+    """
+    returns the time of the last layout change made through set_layout, or None. shared through a
+    file because set_layout is also called from the web api and discord bot processes.
+    """
+    try:
+        return os.stat(LAYOUT_STAMP).st_mtime_ns
+    except FileNotFoundError:
+        return None
 
-        return res
+
+def _mark_layout_change():
+    with open(LAYOUT_STAMP, "a"):
+        os.utime(LAYOUT_STAMP)
 
 
 def set_layout(layout):
     payload = f"load-layout {layout}"
-    return send(payload)
+    res = send(payload)
+    _mark_layout_change()
+
+    return res
 
 
 def _transform_layout_name(name):
     return name.lower().split(".")[0].replace(" ", "").replace("-", "").replace("_", "")
 
 
-def find_layout_file(name):
-    init_name = _transform_layout_name(name)
-    # print(f"{init_name=}")
-    # print(f"{os.listdir(_LAYOUT_DIR)}")
-    layouts = [(_transform_layout_name(f_name), f_name) for f_name in os.listdir(_LAYOUT_DIR) if os.path.isfile(os.path.join(_LAYOUT_DIR, f_name))]
-    
-    for (layout, layout_name) in layouts:
-        # print(f"{layout=}")
-        if init_name == layout:
-            return layout_name
+class LayoutIndex:
+    """
+    maps normalized layout names to the layout files in path. the index is only rebuilt when the
+    directory's mtime changes (ie, a layout was added, removed, or renamed), so lookups are a stat
+    and a dict hit.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.mtime = None
+        self.names = {}
+
+    def refresh(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            self.mtime = None
+            self.names = {}
+            return self.names
+
+        if mtime != self.mtime:
+            names = {}
+
+            for f_name in sorted(os.listdir(self.path)):
+                if os.path.isfile(os.path.join(self.path, f_name)):
+                    names.setdefault(_transform_layout_name(f_name), f_name)
+
+            self.names = names
+            self.mtime = mtime
+
+        return self.names
+
+    def find(self, name, fuzzy=False):
+        """
+        returns the file name of the layout called name, or "". with fuzzy set, a unique prefix or
+        the closest similar name is accepted too (handy for voice commands).
+        """
+        names = self.refresh()
+        init_name = _transform_layout_name(name)
+
+        if init_name in names:
+            return names[init_name]
+
+        if not fuzzy or not init_name:
+            return ""
+
+        prefixed = [layout for layout in names if layout.startswith(init_name)]
+        if len(prefixed) == 1:
+            return names[prefixed[0]]
+
+        close = difflib.get_close_matches(init_name, names, n=1)
+        if close:
+            return names[close[0]]
+
+        return ""
+
+
+LAYOUTS = LayoutIndex(_LAYOUT_DIR)
 
-    return ""
 
+def find_layout_file(name, fuzzy=False):
+    return LAYOUTS.find(name, fuzzy)
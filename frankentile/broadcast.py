@@ -0,0 +1,94 @@
+"""
+broadcast.py
+
+fans events out to many subscribers (the web api's /events streams). every subscriber has a
+bounded buffer, so a slow one loses its oldest events instead of holding up the others or growing
+without bound. the latest event of each state type is kept so new subscribers (and ones that lost
+events) can start from a snapshot.
+"""
+
+
+import threading
+from collections import deque
+
+
+class Subscription:
+    __slots__ = ("events", "dropped")
+
+    def __init__(self, size):
+        self.events = deque(maxlen=size)
+        self.dropped = 0
+
+
+class Broadcaster:
+    """
+    events are dicts with a "type". the latest event of each type in state_types makes up the
+    snapshot. at most max_subscribers (None for no limit) can be subscribed at once.
+    """
+    def __init__(self, state_types=(), buffer_size=64, max_subscribers=None):
+        self.state_types = set(state_types)
+        self.buffer_size = buffer_size
+        self.max_subscribers = max_subscribers
+        self.subscribers = set()
+        self.state = {}
+        self.published = 0
+        self._cond = threading.Condition()
+
+    def publish(self, event):
+        with self._cond:
+            if event["type"] in self.state_types:
+                self.state[event["type"]] = event
+
+            for sub in self.subscribers:
+                if len(sub.events) == sub.events.maxlen:
+                    sub.dropped += 1
+
+                sub.events.append(event)
+
+            self.published += 1
+            self._cond.notify_all()
+
+    def subscribe(self):
+        """returns a new Subscription, or None if max_subscribers are already subscribed"""
+        with self._cond:
+            if self.max_subscribers is not None and len(self.subscribers) >= self.max_subscribers:
+                return None
+
+            sub = Subscription(self.buffer_size)
+            self.subscribers.add(sub)
+
+            return sub
+
+    def unsubscribe(self, sub):
+        with self._cond:
+            self.subscribers.discard(sub)
+
+    def snapshot(self):
+        """the latest event of every state type, by type"""
+        with self._cond:
+            return dict(self.state)
+
+    def get(self, sub, timeout=None):
+        """returns (and clears) the events buffered for sub, waiting up to timeout seconds for one"""
+        with self._cond:
+            if not sub.events:
+                self._cond.wait_for(lambda: sub.events, timeout)
+
+            events = list(sub.events)
+            sub.events.clear()
+
+            return events
+
+    def _pump(self, queue):
+        while True:
+            try:
+                event = queue.get()
+            except (EOFError, OSError):
+                # the other end of the queue is gone.
+                return
+
+            self.publish(event)
+
+    def pump(self, queue):
+        """publishes the events put on queue (ie, a multiprocessing.Queue) from a background thread"""
+        threading.Thread(target=self._pump, args=(queue,), name="frankentile-events", daemon=True).start()
@@ -3,15 +3,13 @@ from discord.ext import commands
 from libqtile.log_utils import logger
 from os import remove as rm, symlink
 from os.path import expanduser, islink, isfile
-import shutil
-from libqtile.command.client import InteractiveCommandClient
 from .gen_keybinding_img import make_imgs
-from .gen_keybinding_img import this_dir as img_dir
 from .auto_desk_api import set_layout, send
 from .tmux import tmux_layout
 from ._discord import config, token
 from functools import wraps
 from . import WALLPAPER_PATH
+from .qtile_ipc import QTILE
 
 
 COMMAND_PREFIX = "/"
@@ -63,11 +61,6 @@ async def on_ready():
 @CLIENT.command(name="get-keybinds")
 async def get_keybinds(ctx):
     """replies with the keyboard currently configured"""
-    try:
-        shutil.rmtree(img_dir)
-    except FileNotFoundError:
-        pass
-
     images = [discord.File(img) for img in make_imgs(config_path=expanduser("~/.config/qtile/config.py"))]
     await ctx.send(files=images)
 
@@ -111,8 +104,7 @@ async def set_tmux_layout(ctx, layout):
 @CLIENT.command(name="reload")
 async def reload_config(ctx):
     """reloads the qtile configs"""
-    c = InteractiveCommandClient()
-    c.reload_config()
+    await QTILE.async_call([], "reload_config")
 
     await ctx.send("reloading configs")
 
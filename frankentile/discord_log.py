@@ -1,84 +1,505 @@
 import time
 import json
+import random
 import asyncio
 import aiohttp
 from libqtile.log_utils import logger
+import libqtile
 from libqtile import hook
 from enum import Enum
-from multiprocessing import Queue
+from collections import deque, OrderedDict
+from threading import Thread
 from os.path import expanduser
 from ._discord import config, token
+from .spool import Spool
+from . import instrument
 
+try:
+    import orjson
 
-WALLPAPER_PATH = expanduser("~/.config/qtile/wallpaper")
-
+    def _dumps(obj):
+        return orjson.dumps(obj).decode("utf-8")
+except ImportError:
+    _dumps = json.dumps
 
-class QueueIter:
-    """an iterable wrapper arrounf multiprocessing.Queue"""
-    def __init__(self, queue: Queue):
-        self.queue = queue if queue else Queue()
 
-    def append(self, element):
-        """add an element to the queue"""
-        self.queue.put(element)
+WALLPAPER_PATH = expanduser("~/.config/qtile/wallpaper")
+SPOOL_DIR = expanduser("~/.cache/frankentile/discord-spool")
+API_BASE = "https://discord.com/api/v10"
+# discord's limit on the length of a message
+MESSAGE_LIMIT = 2000
+# a channel with more messages than this in one flush gets them as a file attachment instead
+ATTACH_AFTER = 5
+HEADERS = {
+    "Authorization": f"Bot {token}",
+    "User-Agent": "FrankenTile (https://discord.com/developers/applications/1134144480979726446/information v0.1)",
+}
+JSON_HEADERS = {**HEADERS, "Content-Type": "application/json"}
+
+
+def _pack(lines, limit=MESSAGE_LIMIT):
+    """yields (index of the first line in the message, message) for every message pack_messages makes"""
+    current = ""
+    first = 0
+
+    for i, line in enumerate(lines):
+        while len(line) > limit:
+            if current:
+                yield first, current
+                current = ""
+
+            yield i, line[:limit]
+            line = line[limit:]
+
+        if not current:
+            current = line
+            first = i
+        elif len(current) + 1 + len(line) <= limit:
+            current += "\n" + line
+        else:
+            yield first, current
+            current = line
+            first = i
 
-    def __repr__(self):
-        return self.__str__()
+    if current:
+        yield first, current
 
-    def __str__(self):
-        return str(self.queue)
 
-    def __bool__(self):
-        return not self.queue.empty()
+def pack_messages(lines, limit=MESSAGE_LIMIT):
+    """packs lines into as few newline separated messages of at most limit characters as possible"""
+    return [message for _, message in _pack(lines, limit)]
 
-    def __len__(self):
-        return len(self.queue)
 
-    def __iter__(self):
-        return self
+class Event:
+    """
+    a logged event, kept as cheap to build as possible since that happens on Qtile's event loop.
+    it's spooled as a compact record and turning it into text is left to the sender.
+    """
+    __slots__ = ("timestamp", "event_type", "payload")
+
+    def __init__(self, event_type, payload, timestamp=None):
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.event_type = event_type
+        self.payload = payload
+
+    def record(self):
+        """returns the event as a record for the spool"""
+        return [self.timestamp, self.event_type, self.payload]
+
+    @classmethod
+    def from_record(cls, record):
+        timestamp, event_type, payload = record
+        return cls(event_type, payload, timestamp)
+
+    def format(self):
+        """returns the event as a json log line"""
+        try:
+            return _dumps(
+                {"timestamp": self.timestamp, "event_type": self.event_type, "payload": self.payload if self.payload else None}
+            )
+        except TypeError as e:
+            text_msg = f"JSON encoding error: {e}"
+            logger.error(f"frankentile error in frankentil.discord.Event.format(). {text_msg}")
+            return text_msg
+
+
+class Dispatcher:
+    """
+    posts to discord while staying under its rate limits. the X-RateLimit-* headers of every
+    response are tracked per route (and per bucket once discord names it), and a send waits for
+    its bucket to reset when it's used up. 429s are retried after Retry-After, 5xxs and connection
+    errors with jittered exponential backoff, anything else is dropped.
 
-    def __next__(self):
-        if self:
-            return self.queue.get()
+    messages that still fail once max_retries is used up are deferred, the caller decides whether
+    to try them again later.
+    """
+    def __init__(self, max_retries=5, backoff=0.5, max_backoff=30):
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.buckets = {}
+        self.limits = {}
+        self.global_reset = 0
+        self.delivered = 0
+        self.retried = 0
+        self.dropped = 0
+        self.deferred = 0
+
+    def _bucket(self, route):
+        return self.buckets.get(route, route)
+
+    async def _wait_for(self, route):
+        """sleeps until a request on route won't go over the rate limit"""
+        now = time.monotonic()
+        delay = self.global_reset - now
+        remaining, reset_at = self.limits.get(self._bucket(route), (1, 0))
+
+        if remaining <= 0:
+            delay = max(delay, reset_at - now)
+
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _update(self, route, headers):
+        bucket = headers.get("X-RateLimit-Bucket")
+        if bucket:
+            self.buckets[route] = bucket
+
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset_after = headers.get("X-RateLimit-Reset-After")
+        if remaining is not None and reset_after is not None:
+            self.limits[self._bucket(route)] = (int(remaining), time.monotonic() + float(reset_after))
+
+    def _rate_limited(self, route, headers, body):
+        """records a 429. the wait for its reset happens in _wait_for."""
+        try:
+            info = json.loads(body)
+        except ValueError:
+            info = {}
+
+        retry_after = float(info.get("retry_after", headers.get("Retry-After", self.backoff)))
+        reset_at = time.monotonic() + retry_after
+
+        if info.get("global") or headers.get("X-RateLimit-Global"):
+            self.global_reset = reset_at
         else:
-            raise StopIteration
+            self.limits[self._bucket(route)] = (0, reset_at)
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    async def send(self, session, route, url, headers, make_payload):
+        """
+        posts make_payload() to url, retrying as needed. make_payload is called for every attempt
+        since form data can only be sent once. returns True if the message was delivered, False if
+        discord rejected it, and None if it couldn't be delivered for now.
+        """
+        for attempt in range(self.max_retries + 1):
+            await self._wait_for(route)
+            delay = 0
+
+            try:
+                async with session.post(url, headers=headers, data=make_payload()) as res:
+                    self._update(route, res.headers)
+                    text = await res.text()
+
+                    if res.status < 300:
+                        self.delivered += 1
+                        return True
+
+                    if res.status == 429:
+                        self._rate_limited(route, res.headers, text)
+                    elif res.status >= 500:
+                        delay = self._backoff(attempt)
+                    else:
+                        logger.warning(f"dropping discord message. status: {res.status}, text: {text}")
+                        self.dropped += 1
+                        return False
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.debug(f"sending discord message failed. got error: {e}")
+                delay = self._backoff(attempt)
+
+            if attempt < self.max_retries:
+                self.retried += 1
+                await asyncio.sleep(delay)
+
+        logger.warning(f"giving up on discord message to {route} after {self.max_retries} retries")
+        self.deferred += 1
+
+        return None
+
+    def stats(self):
+        """returns how many messages were delivered, retried, dropped, and deferred"""
+        return {
+            "delivered": self.delivered,
+            "retried": self.retried,
+            "dropped": self.dropped,
+            "deferred": self.deferred,
+        }
 
 
 class Sender:
-    """a state machine that stores messages to be sent to the discord server and sends them on regular intervals"""
-    def __init__(self):
+    """
+    a state machine that stores messages to be sent to the discord server and sends them as they
+    arrive. messages that arrive within latency seconds of each other go out in the same flush, and
+    the sender sleeps without any timers while nothing is queued.
+
+    the queue holds at most max_queue messages, overflow ("drop-oldest" or "drop-newest") says
+    which message gives when it's full.
+
+    with a spool, every message is written to disk when it's put (and fsynced from a worker thread)
+    and acknowledged once discord has it (or rejected it), so messages that couldn't be sent
+    survive restarts and offline periods. nothing is dropped then: messages past max_queue wait
+    on disk (and so do the ones after them, to keep the order) and are read back as the queue
+    empties.
+    """
+    def __init__(
+        self, api_base=API_BASE, connection_limit=4, latency=0.25, spool=None, retry_delay=30,
+        max_queue=1000, overflow="drop-oldest",
+    ):
         self.connected = False
-        self.queue = None
+        self.queue = deque()
+        self.wakeup = asyncio.Event()
+        self.latency = latency
+        self.spool = None
+        self.syncing = None
+        self.retry_delay = retry_delay
+        self.max_queue = max_queue
+        self.overflow = overflow
+        self.overflowed = 0
+        # where the spooled messages that didn't fit on the queue start
+        self.spill_from = None
+        self.spilled = 0
+        self.api_base = api_base
+        self.dispatcher = Dispatcher()
+        self.connection_limit = connection_limit
+        self.session = None
+        self.running = False
+        self.flushing = asyncio.Lock()
+
+        if spool:
+            self.attach_spool(spool)
+
+    def attach_spool(self, spool):
+        """starts spooling messages to spool and queues the ones that weren't sent last time"""
+        self.spool = spool
+        # they are older than anything put on the queue so far.
+        self.put_back(list(self._replay()))
+
+        if self.queue:
+            self.wakeup.set()
+
+    def _get_session(self):
+        """returns the long lived session, so connections to discord are kept alive between flushes"""
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.connection_limit, keepalive_timeout=60)
+            self.session = aiohttp.ClientSession(connector=connector)
+
+        return self.session
 
     def is_connected(self):
         """returns true if the bot is connected"""
         return self.connected
 
-    async def _send_one(self, session, headers, payload, url):
-        """helper function that sends a single message. called by send_all."""
-        async with session.post(url, headers=headers, data=payload) as res:
-            text = await res.text()
-
-            if res.status != 200:
-                logger.warning(f"status: {res.status}, text: {text}")
+    def _replay(self, since=None):
+        """yields the queue entries for the messages in the spool (from the position since)"""
+        for start, end, (id, message) in self.spool.replay(since):
+            yield id, message if isinstance(message, str) else Event.from_record(message), (start, end)
+
+    def put(self, id, message):
+        """
+        queues message (a string or an Event) for the channel id and wakes the sender up. once
+        max_queue messages are waiting, either the oldest queued message or this one is dropped,
+        depending on overflow, or with a spool this one waits on disk. events are spooled as
+        compact records right away (so restart and shutdown events survive Qtile going away before
+        the flush) and formatted when flushed.
+        """
+        if self.spool:
+            position = self._spool(id, message)
+
+            if self.spool.due():
+                self._sync_soon()
+
+            if self.spill_from is not None or len(self.queue) >= self.max_queue:
+                if self.spill_from is None:
+                    self.spill_from = position[0]
+
+                self.spilled += 1
+                return
+        else:
+            position = None
+
+            if len(self.queue) >= self.max_queue:
+                self.overflowed += 1
+
+                if self.overflow == "drop-newest":
+                    return
+
+                self.queue.popleft()
+
+        self.queue.append((id, message, position))
+        self.wakeup.set()
+
+    def _trim(self):
+        """
+        brings the queue back down to max_queue messages. with a spool the newest ones wait on disk,
+        otherwise they're dropped according to overflow.
+        """
+        while len(self.queue) > self.max_queue:
+            if not self.spool:
+                self.overflowed += 1
+
+                if self.overflow == "drop-newest":
+                    self.queue.pop()
+                else:
+                    self.queue.popleft()
+
+                continue
+
+            entry = self.queue.pop()
+
+            if entry[2]:
+                self.spill_from = entry[2][0]
+                self.spilled += 1
+            else:
+                # put before the spool was attached, so it can't wait there.
+                self.overflowed += 1
+
+    def _refill(self):
+        """reads the messages waiting on disk back onto the queue, as many as fit"""
+        if self.spill_from is None:
+            return
+
+        room = self.max_queue - len(self.queue)
+        waiting = self._replay(self.spill_from)
+        self.spill_from = None
+
+        for entry in waiting:
+            if room <= 0:
+                self.spill_from = entry[2][0]
+                break
+
+            self.queue.append(entry)
+            room -= 1
+
+        if self.queue:
+            self.wakeup.set()
+
+    def _sync_soon(self):
+        """fsyncs the spool from a worker thread, so the event loop (Qtile's) never waits on the disk"""
+        if self.syncing is not None and not self.syncing.done():
+            return
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.spool.sync()
+            return
+
+        self.syncing = loop.run_in_executor(None, self.spool.sync)
+
+    def _spool(self, id, message):
+        """writes message to the spool and returns its position"""
+        if isinstance(message, str):
+            return self.spool.append([id, message])
+
+        try:
+            return self.spool.append([id, message.record()])
+        except TypeError:
+            # the payload can't be encoded, spool the error format() makes of it instead.
+            return self.spool.append([id, message.format()])
+
+    def _ack(self, entries, unsent):
+        """acknowledges the spooled entries that were sent, up to the first one that wasn't"""
+        if not self.spool:
+            return
+
+        if unsent:
+            starts = [entry[2][0] for entry in unsent if entry[2]]
+            position = min(starts) if starts else None
+        else:
+            ends = [entry[2][1] for entry in entries if entry[2]]
+            position = max(ends) if ends else None
+
+        if position:
+            self.spool.ack(position)
+
+    async def _send_channel(self, session, id, entries):
+        """
+        sends the entries logged to one channel, in order, in as few messages as possible. returns
+        the entries that couldn't be sent.
+        """
+        route = f"POST /channels/{id}/messages"
+        url = f"{self.api_base}/channels/{id}/messages"
+        lines = [entry[1] for entry in entries]
+        messages = list(_pack(lines))
+
+        if len(messages) > ATTACH_AFTER:
+            # big bursts go out as a single file rather than a wall of messages.
+            def attachment():
+                payload = aiohttp.FormData()
+                payload.add_field(
+                    "payload_json",
+                    json.dumps({"content": f"{len(lines)} log messages attached"}),
+                    content_type="application/json",
+                )
+                payload.add_field("files[0]", "\n".join(lines).encode("utf-8"), filename="log.txt")
+                return payload
+
+            res = await self.dispatcher.send(session, route, url, HEADERS, attachment)
+            return entries if res is None else []
+
+        for first, message in messages:
+            payload = json.dumps({"content": message})
+            res = await self.dispatcher.send(session, route, url, JSON_HEADERS, lambda: payload)
+
+            if res is None:
+                # later messages wait for this one so the channel stays in order.
+                return entries[first:]
+
+        return []
+
+    def put_back(self, entries):
+        """puts entries that couldn't be sent back at the front of the queue"""
+        self.queue.extendleft(reversed(entries))
+        self._trim()
 
     async def send_all(self):
-        """sends all messages in the queue"""
-        headers = {
-            "Authorization": f"Bot {token}",
-            "User-Agent": "FrankenTile (https://discord.com/developers/applications/1134144480979726446/information v0.1)",
-            "Content-Type": "application/json"
-        }
+        """
+        sends all messages in the queue, batched per channel. returns False if some of them couldn't
+        be sent, those are put back on the queue.
+        """
+        entries = []
+        channels = {}
 
-        async with aiohttp.ClientSession() as client:
-            reqs = []
+        if not self.queue:
+            self._refill()
 
-            for id, message in self.queue:
-                url = f"https://discord.com/api/v10/channels/{id}/messages"
-                payload = json.dumps({"content": message})
-                reqs.append(self._send_one(client, headers, payload, url))
+        while self.queue:
+            entry = self.queue.popleft()
 
-            await asyncio.gather(*reqs)
+            if isinstance(entry[1], Event):
+                entry = (entry[0], entry[1].format(), entry[2])
+
+            entries.append(entry)
+            channels.setdefault(entry[0], []).append(entry)
+
+        if not entries:
+            return True
+
+        if self.spool:
+            await asyncio.to_thread(self.spool.sync)
+
+        session = self._get_session()
+        results = await asyncio.gather(*[
+            self._send_channel(session, id, channel_entries) for id, channel_entries in channels.items()
+        ])
+
+        failed = {id(entry) for result in results for entry in result}
+        unsent = [entry for entry in entries if id(entry) in failed]
+        self.put_back(unsent)
+        self._ack(entries, unsent)
+        self._refill()
+
+        return not unsent
+
+    async def flush(self):
+        """sends everything queued, waiting for a flush that's already running to finish first"""
+        async with self.flushing:
+            return await self.send_all()
+
+    async def close(self):
+        """stops the sender, sends whatever is still queued, and closes the session"""
+        self.running = False
+        self.wakeup.set()
+        await self.flush()
+
+        if self.spool:
+            await asyncio.to_thread(self.spool.sync)
+
+        if self.session:
+            await self.session.close()
+            self.session = None
 
     async def try_send_all(self, client, message: (int, str) = None):
         """trys to send messages, if not connected the messages get dumped in the queue"""
@@ -88,22 +509,39 @@ class Sender:
         if self.connected:
             await self._send_all(client)
 
-    async def init_sender(self, queue):
-        self.queue = QueueIter(queue)
-
+    def _pump(self, loop, queue):
+        """moves (id, message) pairs from a cross process queue onto the sender"""
         while True:
-            if self.queue:
-                await self.send_all()
+            id, message = queue.get()
+            loop.call_soon_threadsafe(self.put, id, message)
+
+    async def init_sender(self, queue=None):
+        """
+        sends messages as they are put on the sender. if the producers live in another process,
+        queue is a multiprocessing.Queue of (id, message) pairs that gets forwarded to the sender.
+        """
+        self.running = True
 
-            await asyncio.sleep(2.5)
+        if queue is not None:
+            Thread(target=self._pump, args=(asyncio.get_running_loop(), queue), daemon=True).start()
+
+        while self.running:
+            await self.wakeup.wait()
+            # lets messages that arrive close together go out in one flush
+            await asyncio.sleep(self.latency)
+            self.wakeup.clear()
+
+            if not await self.flush():
+                # discord can't be reached right now, the messages stay queued (and spooled).
+                await asyncio.sleep(self.retry_delay)
+                self.wakeup.set()
 
 
 MESSENGER = Sender()
-QUEUE = Queue()
 
 
 def init_sender(queue):
-    """waits for the bot to be connected and then starts sending messages in an iterval"""
+    """starts sending messages put on queue from other processes as they arrive"""
     asyncio.run(MESSENGER.init_sender(queue))
 
 
@@ -131,25 +569,106 @@ class EventType(str, Enum):
 
 async def send_log(id: int, event_type: EventType, payload: dict):
     """sends a time stamped log to the channel described by id"""
-    try:
-        text_msg = json.dumps(
-            {"timestamp": time.time(), "event_type": event_type, "payload": payload if payload else None}
-        )
-    except TypeError as e:
-        text_msg = f"JSON encoding error: {e}"
-        logger.error(f"frankentile error in frankentil.discord.send_log(). {text_msg}")
-
-    await send_mesg(id, text_msg)
+    MESSENGER.put(id, Event(event_type, payload))
 
 
 async def send_mesg(id: int, mesg: str):
     """sends a timestamped message to the channel described by id"""
     # logger.warning(f"adding to queue {(id, mesg)}")
-    QUEUE.put((id, mesg))
+    MESSENGER.put(id, mesg)
 
 
-async def log(event_type: EventType, payload: dict):
-    """generic log function bc many hooks have similar code"""
+class EventPolicy:
+    """
+    decides which events of one EventType make it to the log, so event storms don't turn into
+    discord spam. applied in this order:
+
+    dedupe: skip an event with the same payload as the previous one.
+    sample: only log every sample-th event.
+    rate: log at most rate events per period seconds.
+    aggregate: log a single summary (ie, "14 focus_change events in 10 s") every aggregate seconds
+        instead of the events themselves.
+    """
+    def __init__(self, rate=None, period=1.0, sample=1, dedupe=False, aggregate=None):
+        self.rate = rate
+        self.period = period
+        self.sample = sample
+        self.dedupe = dedupe
+        self.aggregate = aggregate
+        self.last = None
+        self.seen = 0
+        self.window_start = 0
+        self.window_count = 0
+        self.aggregated = 0
+        self.aggregate_last = None
+        self.suppressed = 0
+
+    def admit(self, payload):
+        """returns True if the event should be logged now. aggregated events are counted instead."""
+        if self.dedupe:
+            if payload == self.last:
+                self.suppressed += 1
+                return False
+
+            self.last = payload
+
+        self.seen += 1
+        if self.seen % self.sample:
+            self.suppressed += 1
+            return False
+
+        if self.rate is not None:
+            now = time.monotonic()
+
+            if now - self.window_start >= self.period:
+                self.window_start = now
+                self.window_count = 0
+
+            if self.window_count >= self.rate:
+                self.suppressed += 1
+                return False
+
+            self.window_count += 1
+
+        if self.aggregate:
+            self.aggregated += 1
+            self.aggregate_last = payload
+            return False
+
+        return True
+
+    def summary(self, event_type):
+        """returns the summary payload for the events aggregated so far and resets the count"""
+        count, last = self.aggregated, self.aggregate_last
+        self.aggregated = 0
+        self.aggregate_last = None
+
+        return {
+            "message": f"{count} {event_type.value} events in {self.aggregate} s",
+            "count": count,
+            "last": last,
+        }
+
+
+POLICIES = {
+    EventType.focus_change: EventPolicy(dedupe=True, aggregate=10),
+    EventType.group_switch: EventPolicy(dedupe=True, aggregate=10),
+    EventType.volume: EventPolicy(dedupe=True, rate=1, period=2),
+    EventType.bat_level_change: EventPolicy(dedupe=True, rate=1, period=60),
+}
+_AGGREGATING = set()
+_AGGREGATING_TASKS = set()
+
+
+async def _log_summary(event_type: EventType):
+    """waits out the aggregation window of event_type then logs its summary"""
+    policy = POLICIES[event_type]
+    await asyncio.sleep(policy.aggregate)
+    _AGGREGATING.discard(event_type)
+    await _log(event_type, policy.summary(event_type))
+
+
+async def _log(event_type: EventType, payload: dict):
     try:
         id = config.get("discord").get("log-channel")
     except TypeError as e:
@@ -158,25 +677,67 @@ async def log(event_type: EventType, payload: dict):
         await send_log(id, event_type, payload)
 
 
+async def log(event_type: EventType, payload: dict):
+    """generic log function bc many hooks have similar code. applies event_type's EventPolicy."""
+    policy = POLICIES.get(event_type)
+
+    if policy is None or policy.admit(payload):
+        await _log(event_type, payload)
+    elif policy.aggregated and event_type not in _AGGREGATING:
+        _AGGREGATING.add(event_type)
+        task = asyncio.create_task(_log_summary(event_type))
+        _AGGREGATING_TASKS.add(task)
+        task.add_done_callback(_AGGREGATING_TASKS.discard)
+
+
+# wm class and pid of the windows logged by new_window, so closed_window doesn't have to ask X again
+_WINDOWS = OrderedDict()
+_MAX_WINDOWS = 1024
+
+
+@instrument.timed
 async def closed_window(win):
     """
     Called after a client has been unmanaged
     (when the window is closed by the user.
     """
-    await log(
-        EventType.window_closed,
-        {"name": win.name, "wm_class": win.get_wm_class(), "pid": win.get_pid()}
-    )
+    info = _WINDOWS.pop(win.wid, None)
+    if info:
+        wm_class, pid = info
+    else:
+        instrument.count("x")
+        wm_class, pid = win.get_wm_class(), win.get_pid()
 
+    await log(EventType.window_closed, {"name": win.name, "wm_class": wm_class, "pid": pid})
 
+
+@instrument.timed
 async def new_window(win):
     """Called after Qtile starts managing a new client."""
-    await log(
-        EventType.new_window,
-        {"name": win.name, "wm_class": win.get_wm_class(), "pid": win.get_pid()}
-    )
+    instrument.count("x")
+    wm_class = win.get_wm_class()
+    pid = win.get_pid()
+    _WINDOWS[win.wid] = (wm_class, pid)
+
+    if len(_WINDOWS) > _MAX_WINDOWS:
+        _WINDOWS.popitem(last=False)
+
+    await log(EventType.new_window, {"name": win.name, "wm_class": wm_class, "pid": pid})
+
 
+@instrument.timed
+async def group_switch():
+    """Called whenever a group change occurs."""
+    await log(EventType.group_switch, {"group": libqtile.qtile.current_group.name})
 
+
+@instrument.timed
+async def focus_change(win):
+    """Called whenever focus moves to a client window."""
+    await log(EventType.focus_change, {"name": win.name})
+
+
+@instrument.timed
 async def restart():
     """
     Called before Qtile is restarted.
@@ -185,42 +746,60 @@ async def restart():
     await log(EventType.restart, {})
 
 
+@instrument.timed
 async def resume():
     """Called when system wakes up from sleep, suspend or hibernate."""
     await log(EventType.resume, {})
 
 
+@instrument.timed
 async def monitor_change():
     """Called when the output configuration is changed (e.g. via randr in X11)."""
     await log(EventType.mon_change, {})
 
 
+@instrument.timed
 async def shutdown():
     """Called before Qtile is shutdown"""
     # logger.warning("shutting down")
     await log(EventType.shutdown, {})
+    # flushes the shutdown event (and anything else still queued) before Qtile exits.
+    await MESSENGER.close()
     # await kill_bot()
 
 
+@instrument.timed
 async def start_success():
     """Called when Qtile is started after all resources initialized"""
     await log(EventType.booted, {"message": "Qtile configured successfully"})
 
 
+@instrument.timed
 async def login():
     """Called when Qtile has started on first start"""
     await log(EventType.login, {"message": "Welcome to Qtile!"})
 
 
 async def init_logger():
-    await MESSENGER.init_sender(QUEUE)
+    await MESSENGER.init_sender()
 
 
-def init():
-    """initializes the discord api. should be called from Qtile's main config.py"""
-    hook.subscribe.startup_once(init_logger)
+def init(activity=False):
+    """
+    initializes the discord api. should be called from Qtile's main config.py. with activity, group
+    switches and focus changes are logged too (as a summary every 10 s, see POLICIES).
+    """
+    if MESSENGER.spool is None:
+        MESSENGER.attach_spool(Spool(SPOOL_DIR, dumps=_dumps))
+    # startup (not startup_once) so the sender comes back, and replays the spool, after a restart.
+    hook.subscribe.startup(init_logger)
     hook.subscribe.client_killed(closed_window)
     hook.subscribe.client_managed(new_window)
+
+    if activity:
+        hook.subscribe.setgroup(group_switch)
+        hook.subscribe.client_focus(focus_change)
+
     hook.subscribe.restart(restart)
     hook.subscribe.resume(resume)
     hook.subscribe.screen_change(monitor_change)
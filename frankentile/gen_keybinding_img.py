@@ -8,8 +8,17 @@ https://github.com/qtile/qtile/blob/master/scripts/gen-keybinding-img
 #######################################
 import os
 import sys
+import shutil
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
 import cairocffi as cairo
 from cairocffi import ImageSurface
+from . import grafana
 
 
 # this_dir = os.path.dirname(__file__)
@@ -17,11 +26,23 @@ from cairocffi import ImageSurface
 # sys.path.insert(0, base_dir)
 
 this_dir = "/tmp/qtile-keybindings/"
+cache_dir = os.path.expanduser("~/.cache/frankentile/keybindings/")
+
+# bump this when the drawing code changes so old cache entries stop matching
+RENDER_VERSION = 2
+CACHE_MAX_ENTRIES = 64
+CACHE_MAX_AGE = 30 * 24 * 60 * 60
+
+RENDER_TIME = grafana.histogram("keybinding_render_seconds", "time spent rendering keybinding sheets, per batch")
+SHEETS_RENDERED = grafana.counter("keybinding_sheets_rendered_total", "keybinding sheets rendered (cache misses)")
 
 
 BUTTON_NAME_Y = 65
 BUTTON_NAME_X = 10
 
+IMG_WIDTH = 1280
+IMG_HEIGHT = 800
+
 COMMAND_Y = 20
 COMMAND_X = 10
 
@@ -80,10 +101,34 @@ class Pos:
 
 
 class KeyboardPNGFactory:
+    # the key positions and the modifier independent parts of the image are the same for every
+    # sheet, so they are built once per process and shared by every render.
+    _key_pos = None
+    _base = None
+
     def __init__(self, modifiers, keys):
         self.keys = keys
         self.modifiers = modifiers.split('-')
-        self.key_pos = self.calculate_pos(20, 140)
+        self.key_pos = self.key_pos_table()
+
+    @classmethod
+    def key_pos_table(cls):
+        if cls._key_pos is None:
+            cls._key_pos = cls.calculate_pos(20, 140)
+
+        return cls._key_pos
+
+    @classmethod
+    def base_surface(cls):
+        """returns the background, title, unbound keys, legend, and mouse box"""
+        if cls._base is None:
+            surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, IMG_WIDTH, IMG_HEIGHT)
+            context = cairo.Context(surface)
+            cls('', {}).draw_base(context)
+            surface.flush()
+            cls._base = surface
+
+        return cls._base
 
     def rgb_red(self, context):
         context.set_source_rgb(0.8431372549, 0.3725490196, 0.3725490196)
@@ -100,7 +145,8 @@ class KeyboardPNGFactory:
     def rgb_violet(self, context):
         context.set_source_rgb(0.831372549, 0.5215686275, 0.6784313725)
 
-    def calculate_pos(self, x, y):
+    @staticmethod
+    def calculate_pos(x, y):
         pos = Pos(x, y)
 
         key_pos = {}
@@ -169,9 +215,7 @@ class KeyboardPNGFactory:
         context.paint()
         context.restore()
 
-    def render(self, filename):
-        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, 1280, 800)
-        context = cairo.Context(surface)
+    def draw_base(self, context):
         with context:
             context.set_source_rgb(1, 1, 1)
             context.paint()
@@ -182,6 +226,29 @@ class KeyboardPNGFactory:
         context.set_font_size(28)
         context.show_text('Keybindings for Qtile')
 
+        for i in self.key_pos.values():
+            if i.key in ['FN_KEYS']:
+                continue
+
+            self.draw_button(context, i.key, i.x, i.y, i.width, i.height)
+
+        # draw mouse base
+        context.rectangle(830, 660, 244, 90)
+        context.set_source_rgb(0, 0, 0)
+        context.stroke()
+        context.set_font_size(28)
+        context.move_to(900, 720)
+        context.show_text('MOUSE')
+
+    def render(self, filename=None):
+        """renders the sheet to filename, or returns the png data if no filename is given"""
+        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, IMG_WIDTH, IMG_HEIGHT)
+        context = cairo.Context(surface)
+        with context:
+            context.set_source_surface(self.base_surface())
+            context.paint()
+
+        context.set_source_rgb(0, 0, 0)
         context.move_to(210, 100)
         context.set_font_size(18)
         if len([i for i in self.modifiers if i]):
@@ -189,8 +256,10 @@ class KeyboardPNGFactory:
         else:
             context.show_text('No modifiers used.')
 
-        for i in self.key_pos.values():
-            if i.key in ['FN_KEYS']:
+        # only the keys that differ from the base need to be drawn again
+        for key in dict.fromkeys(self.modifiers + list(self.keys)):
+            i = self.key_pos.get(key)
+            if i is None or i.key in ['FN_KEYS']:
                 continue
 
             self.draw_button(context, i.key, i.x, i.y, i.width, i.height)
@@ -204,15 +273,7 @@ class KeyboardPNGFactory:
                 self.draw_button(context, i.key, x, fn_pos.y, fn_pos.width, fn_pos.height)
                 x += Pos.GAP + Pos.WIDTH
 
-        # draw mouse base
-        context.rectangle(830, 660, 244, 90)
-        context.set_source_rgb(0, 0, 0)
-        context.stroke()
-        context.set_font_size(28)
-        context.move_to(900, 720)
-        context.show_text('MOUSE')
-
-        surface.write_to_png(filename)
+        return surface.write_to_png(filename)
 
     def draw_button(self, context, key, x, y, width, height):
         fn = False
@@ -359,12 +420,12 @@ class MInfo(KInfo):
         self.scope = self.get_scope(mouse)
 
 
-def get_kb_map(config_path):
+def _load_kb_map(config_path):
     from libqtile.confreader import Config
 
     c = Config(config_path)
     if config_path:
-        c.load() 
+        c.load()
 
     kb_map = {}
     for key in c.keys:
@@ -386,27 +447,261 @@ def get_kb_map(config_path):
     return kb_map
 
 
+_KB_MAP_CACHE = {}
+
+
+def _config_mtimes(config_path):
+    """
+    the mtimes of config_path and of every loaded module under its directory (the ones config.py
+    imports, like a keys.py next to it). a deleted file gets None.
+    """
+    config_dir = os.path.dirname(os.path.abspath(config_path)) + os.sep
+    paths = {os.path.abspath(config_path)}
+
+    for module in list(sys.modules.values()):
+        path = getattr(module, "__file__", None)
+        if path and os.path.abspath(path).startswith(config_dir):
+            paths.add(os.path.abspath(path))
+
+    mtimes = []
+    for path in sorted(paths):
+        try:
+            mtimes.append((path, os.stat(path).st_mtime_ns))
+        except OSError:
+            mtimes.append((path, None))
+
+    return tuple(mtimes)
+
+
+def get_kb_map(config_path):
+    """
+    returns the keybinding map of the config at config_path. the map is only rebuilt when the
+    config file, or a module under its directory that it imports, has been modified since the last
+    call.
+    """
+    try:
+        os.stat(config_path)
+    except (OSError, TypeError):
+        return _load_kb_map(config_path)
+
+    cached = _KB_MAP_CACHE.get(config_path)
+    if cached and cached[0] == _config_mtimes(config_path):
+        return cached[1]
+
+    kb_map = _load_kb_map(config_path)
+    # taken after loading, so modules imported for the first time are part of it
+    _KB_MAP_CACHE[config_path] = (_config_mtimes(config_path), kb_map)
+
+    return kb_map
+
+
+def keys_digest(modifier, keys):
+    """a hash of everything that ends up on the image rendered for modifier"""
+    normalized = sorted((str(k.key), k.command, k.scope) for k in keys.values())
+    data = json.dumps([RENDER_VERSION, modifier, normalized])
 
-def make_imgs(config_path=None):
-    # config_path = None
-    output_dir = this_dir
-    os.makedirs(output_dir, exist_ok=True)
-    files = []
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+
+def img_name(modifier):
+    """the file name of the image for modifier"""
+    if not modifier:
+        return "no_modifier.png"
+
+    return "{}.png".format(modifier)
+
+
+def prune_cache(max_entries=CACHE_MAX_ENTRIES, max_age=CACHE_MAX_AGE):
+    """removes cache entries that are older than max_age or beyond the newest max_entries"""
+    try:
+        entries = [os.path.join(cache_dir, name) for name in os.listdir(cache_dir)]
+    except FileNotFoundError:
+        return
+
+    entries = [(os.stat(path).st_mtime, path) for path in entries if os.path.isdir(path)]
+    entries.sort(reverse=True)
+    now = time.time()
+
+    for i, (mtime, path) in enumerate(entries):
+        if i >= max_entries or now - mtime > max_age:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def _render_sheet(job):
+    """
+    renders a single modifier sheet, stores it at its output file, and returns the png data.
+    module level so it can be handed to a process pool.
+    """
+    modifier, keys, output_file = job
+    f = KeyboardPNGFactory(modifier, keys)
+    data = f.render()
+
+    with open(output_file + ".tmp", "wb") as out:
+        out.write(data)
+
+    os.replace(output_file + ".tmp", output_file)
+
+    return data
+
+
+_POOL = None
+_POOL_WORKERS = 0
+_POOL_LOCK = threading.Lock()
+
+
+def _render_pool(processes):
+    """
+    returns this process' pool of processes render workers, made on first use and kept between
+    calls. the workers are started by a forkserver, since forking a process that has other threads
+    running (ie, the web api) can deadlock on a lock one of them was holding.
+    """
+    global _POOL, _POOL_WORKERS
+
+    with _POOL_LOCK:
+        if _POOL is None or _POOL_WORKERS != processes:
+            if _POOL is not None:
+                _POOL.shutdown(wait=False)
+
+            _POOL = ProcessPoolExecutor(processes, mp_context=get_context("forkserver"))
+            _POOL_WORKERS = processes
+
+        return _POOL
+
+
+def _drop_pool(pool):
+    """forgets pool (if it's still the current one) so the next render makes a new one"""
+    global _POOL
+
+    with _POOL_LOCK:
+        if _POOL is pool:
+            _POOL = None
+
+    pool.shutdown(wait=False)
+
+
+def render_sheets(jobs, processes=1):
+    """
+    renders every (modifier, keys, output_file) job in jobs, spreading them over processes
+    worker processes when processes is greater than one. returns the png data of each sheet in
+    the same order as jobs.
+    """
+    if not jobs:
+        return []
+
+    with RENDER_TIME.time(processes=min(processes, len(jobs))):
+        if processes > 1 and len(jobs) > 1:
+            pool = _render_pool(processes)
+
+            try:
+                sheets = list(pool.map(_render_sheet, jobs))
+            except BrokenProcessPool:
+                # a worker died (ie, was killed), render these here and start over next time.
+                _drop_pool(pool)
+                sheets = [_render_sheet(job) for job in jobs]
+        else:
+            sheets = [_render_sheet(job) for job in jobs]
+
+    SHEETS_RENDERED.inc(len(jobs))
+
+    return sheets
+
+
+def _cache_lookup(kb_map):
+    """
+    returns a (modifier, keys, output_file, cached) tuple for every modifier in kb_map. cache
+    entries that are found are marked as recently used, missing ones get their directory made.
+    """
+    sheets = []
 
-    kb_map = get_kb_map(config_path if config_path else os.expanduser("~/.config/qtile/config.py"))
     for modifier, keys in kb_map.items():
-        if not modifier:
-            filename = "no_modifier.png"
+        entry = os.path.join(cache_dir, keys_digest(modifier, keys))
+        output_file = os.path.join(entry, img_name(modifier))
+        cached = os.path.isfile(output_file)
+
+        if cached:
+            # marks the entry as recently used for prune_cache
+            os.utime(entry)
         else:
-            filename = "{}.png".format(modifier)
+            os.makedirs(entry, exist_ok=True)
+
+        sheets.append((modifier, keys, output_file, cached))
+
+    return sheets
+
+
+def keymap_digest(kb_map):
+    """a hash of the whole keymap. changes whenever any of its sheets would change."""
+    digests = [keys_digest(modifier, keys) for modifier, keys in sorted(kb_map.items())]
+
+    return hashlib.sha1("".join(digests).encode("utf-8")).hexdigest()
+
+
+def make_imgs(config_path=None, processes=1):
+    """
+    renders an image for every modifier combination and returns the paths to them. images are
+    stored in cache_dir keyed by a hash of their bindings, so only modifiers whose bindings
+    changed get re-rendered. processes sets how many worker processes are used to render them.
+    """
+    kb_map = get_kb_map(config_path if config_path else os.path.expanduser("~/.config/qtile/config.py"))
+    sheets = _cache_lookup(kb_map)
+
+    render_sheets([sheet[:3] for sheet in sheets if not sheet[3]], processes)
+    prune_cache()
+
+    return [sheet[2] for sheet in sheets]
+
+
+def iter_pngs(kb_map, processes=1):
+    """
+    yields a (file name, png data) pair for every modifier in kb_map. cached sheets are read
+    from disk once, missing ones are rendered straight to memory.
+    """
+    sheets = _cache_lookup(kb_map)
+    rendered = iter(render_sheets([sheet[:3] for sheet in sheets if not sheet[3]], processes))
+
+    for modifier, _keys, output_file, cached in sheets:
+        if cached:
+            with open(output_file, "rb") as f:
+                yield img_name(modifier), f.read()
+        else:
+            yield img_name(modifier), next(rendered)
+
+    prune_cache()
+
+
+def bench(config_path, processes):
+    """times rendering every sheet serially and with a pool of processes workers"""
+    import tempfile
+
+    kb_map = get_kb_map(config_path)
 
-        output_file = os.path.abspath(os.path.join(output_dir, filename))
-        f = KeyboardPNGFactory(modifier, keys)
-        f.render(output_file)
-        files.append(output_file)
+    for n in (1, processes):
+        with tempfile.TemporaryDirectory() as tmp:
+            jobs = [
+                (modifier, keys, os.path.join(tmp, img_name(modifier)))
+                for modifier, keys in kb_map.items()
+            ]
+            start = time.perf_counter()
+            render_sheets(jobs, n)
+            took = time.perf_counter() - start
 
-    return files
+        print(f"{len(jobs)} sheets, {n} process(es): {took:.3f}s")
 
 
 if __name__ == '__main__':
-    make_imgs()
+    import argparse
+
+    parser = argparse.ArgumentParser(
+                    prog='frankentile keybinding images',
+                    description='renders an image of the keybindings for every modifier combination.',
+                    )
+    parser.add_argument('config', nargs='?', default=os.path.expanduser("~/.config/qtile/config.py"))
+    parser.add_argument('-p', '--processes', type=int, default=os.cpu_count())
+    parser.add_argument('--bench', action='store_true', help='compare serial and parallel render times')
+
+    args = parser.parse_args()
+
+    if args.bench:
+        bench(args.config, args.processes)
+    else:
+        print("\n".join(make_imgs(args.config, args.processes)))
@@ -2,4 +2,303 @@
 grafana.py
 
 send logging data to a grafana server
+
+keeps counters and histograms in memory, pushes them in batches to a graphite server (which
+grafana can read from) using graphite's plaintext protocol, and serves them on a prometheus style
+/metrics endpoint so they can be scraped instead.
 """
+
+
+import time
+import asyncio
+import threading
+from contextlib import contextmanager
+from libqtile.log_utils import logger
+from libqtile import hook
+
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# metrics are updated from several threads in the web api (one per request), this keeps updates
+# from getting lost and exports from seeing a metric change under them.
+_LOCK = threading.Lock()
+
+
+def _labels_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _prom_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+
+    if not pairs:
+        return ""
+
+    inner = ",".join(f'{name}="{_escape(value)}"' for name, value in pairs)
+    return "{" + inner + "}"
+
+
+def _graphite_name(*parts):
+    return ".".join(str(part).replace(" ", "_").replace(".", "_") for part in parts if part != "")
+
+
+class Counter:
+    """a number that only goes up, one per combination of labels"""
+    kind = "counter"
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = _labels_key(labels)
+
+        with _LOCK:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def prometheus(self):
+        with _LOCK:
+            values = list(self.values.items())
+
+        return [f"{self.name}{_prom_labels(key)} {value}" for key, value in values]
+
+    def graphite(self, prefix, timestamp):
+        with _LOCK:
+            values = list(self.values.items())
+
+        return [
+            f"{_graphite_name(prefix, self.name, *(v for _, v in key))} {value} {timestamp}"
+            for key, value in values
+        ]
+
+
+class Histogram:
+    """counts observations into buckets, one set of buckets per combination of labels"""
+    kind = "histogram"
+
+    def __init__(self, name, help, buckets=BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.values = {}
+
+    def observe(self, value, **labels):
+        key = _labels_key(labels)
+
+        with _LOCK:
+            counts = self.values.get(key)
+
+            if counts is None:
+                # a count per bucket, then the total count and the sum
+                counts = self.values[key] = [0] * len(self.buckets) + [0, 0]
+
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+
+            counts[-2] += 1
+            counts[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """observes how long the with block took"""
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def counts(self, **labels):
+        """a copy of the bucket counts (then the total count and the sum) for labels, None if unobserved"""
+        with _LOCK:
+            counts = self.values.get(_labels_key(labels))
+
+            return list(counts) if counts else None
+
+    def _snapshot(self):
+        with _LOCK:
+            return [(key, list(counts)) for key, counts in self.values.items()]
+
+    def prometheus(self):
+        lines = []
+
+        for key, counts in self._snapshot():
+            for bound, count in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_prom_labels(key, [('le', bound)])} {count}")
+
+            lines.append(f"{self.name}_bucket{_prom_labels(key, [('le', '+Inf')])} {counts[-2]}")
+            lines.append(f"{self.name}_count{_prom_labels(key)} {counts[-2]}")
+            lines.append(f"{self.name}_sum{_prom_labels(key)} {counts[-1]}")
+
+        return lines
+
+    def graphite(self, prefix, timestamp):
+        lines = []
+
+        for key, counts in self._snapshot():
+            name = _graphite_name(prefix, self.name, *(v for _, v in key))
+            count, total = counts[-2], counts[-1]
+            lines.append(f"{name}.count {count} {timestamp}")
+            lines.append(f"{name}.sum {total} {timestamp}")
+            lines.append(f"{name}.avg {total / count if count else 0} {timestamp}")
+
+        return lines
+
+
+METRICS = {}
+
+
+def counter(name, help=""):
+    """returns the counter called name, making it if needed"""
+    with _LOCK:
+        if name not in METRICS:
+            METRICS[name] = Counter(name, help)
+
+        return METRICS[name]
+
+
+def histogram(name, help="", buckets=BUCKETS):
+    """returns the histogram called name, making it if needed"""
+    with _LOCK:
+        if name not in METRICS:
+            METRICS[name] = Histogram(name, help, buckets)
+
+        return METRICS[name]
+
+
+def prometheus_text():
+    """every metric in prometheus' text exposition format"""
+    lines = []
+
+    with _LOCK:
+        metrics = list(METRICS.values())
+
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.prometheus())
+
+    return "\n".join(lines) + "\n"
+
+
+def graphite_lines(prefix="frankentile", timestamp=None):
+    """every metric in graphite's plaintext protocol"""
+    timestamp = int(timestamp if timestamp else time.time())
+    with _LOCK:
+        metrics = list(METRICS.values())
+
+    return [line for metric in metrics for line in metric.graphite(prefix, timestamp)]
+
+
+class Pusher:
+    """pushes every metric to a graphite server every interval seconds, in one batch per push"""
+    def __init__(self, host, port=2003, prefix="frankentile", interval=30):
+        self.host = host
+        self.port = port
+        self.prefix = prefix
+        self.interval = interval
+        self.pushed = 0
+        self.failed = 0
+
+    async def push(self):
+        lines = graphite_lines(self.prefix)
+
+        if not lines:
+            return
+
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.interval)
+            writer.write(("\n".join(lines) + "\n").encode("utf-8"))
+            await writer.drain()
+            writer.close()
+            await writer.wait_closed()
+        except (OSError, asyncio.TimeoutError) as e:
+            self.failed += 1
+            logger.warning(f"could not push metrics to graphite at {self.host}:{self.port}. got error: {e}")
+        else:
+            self.pushed += 1
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.push()
+
+
+async def _handle_scrape(reader, writer):
+    try:
+        request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 5)
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError):
+        writer.close()
+        return
+
+    method, path, *_ = request.split(b"\r\n", 1)[0].decode("latin-1").split(" ") + ["", ""]
+
+    if method == "GET" and path.split("?")[0] == "/metrics":
+        body = prometheus_text().encode("utf-8")
+        head = "HTTP/1.1 200 OK\r\nContent-Type: text/plain; version=0.0.4"
+    else:
+        body = b"not found\n"
+        head = "HTTP/1.1 404 Not Found\r\nContent-Type: text/plain"
+
+    writer.write(f"{head}\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body)
+    await writer.drain()
+    writer.close()
+
+
+async def serve_metrics(host="127.0.0.1", port=9101):
+    """serves prometheus_text() at http://host:port/metrics"""
+    return await asyncio.start_server(_handle_scrape, host, port)
+
+
+async def window_opened(win):
+    counter("windows_opened_total", "windows opened per wm class").inc(wm_class=_wm_class(win))
+
+
+async def window_closed(win):
+    counter("windows_closed_total", "windows closed").inc()
+
+
+async def group_switched():
+    counter("group_switches_total", "group switches").inc()
+
+
+def _wm_class(win):
+    wm_class = win.get_wm_class()
+    return wm_class[-1] if wm_class else "unknown"
+
+
+_TASKS = set()
+_SERVERS = []
+
+
+def _spawn(coro):
+    task = asyncio.create_task(coro)
+    _TASKS.add(task)
+    task.add_done_callback(_TASKS.discard)
+
+
+def init(graphite=None, graphite_port=2003, prefix="frankentile", interval=30, metrics_host="127.0.0.1", metrics_port=9101):
+    """
+    initializes metrics collection. should be called from Qtile's main config.py. metrics are
+    pushed to graphite if a graphite host is given, and served on metrics_host:metrics_port unless
+    metrics_port is None.
+    """
+    async def start():
+        if graphite:
+            _spawn(Pusher(graphite, graphite_port, prefix, interval).run())
+
+        if metrics_port is not None:
+            try:
+                _SERVERS.append(await serve_metrics(metrics_host, metrics_port))
+            except OSError as e:
+                logger.error(f"could not serve metrics on {metrics_host}:{metrics_port}. got error: {e}")
+
+    hook.subscribe.startup(start)
+    hook.subscribe.client_managed(window_opened)
+    hook.subscribe.client_killed(window_closed)
+    hook.subscribe.setgroup(group_switched)
@@ -0,0 +1,160 @@
+"""
+instrument.py
+
+latency tracking for frankentile's hook handlers. handlers wrapped with timed() record how long
+they take (into the grafana module's hook_seconds histogram), log calls slower than SLOW seconds,
+and count the socket, X, and IPC calls they make. everything is off until init() is called, and
+while off a wrapped handler costs one global lookup.
+"""
+
+
+import time
+import asyncio
+from functools import wraps
+from contextvars import ContextVar
+from libqtile.log_utils import logger
+from libqtile import hook
+from . import grafana
+
+
+ENABLED = False
+# calls slower than this (in seconds) get logged
+SLOW = 0.05
+LATENCY = grafana.histogram(
+    "hook_seconds",
+    "hook handler latency",
+    (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+)
+STATS = {}
+_CURRENT = ContextVar("frankentile_hook_handler", default=None)
+
+
+class HandlerStats:
+    __slots__ = ("calls", "total", "max", "slow", "counts")
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.slow = 0
+        self.counts = {"socket": 0, "x": 0, "ipc": 0}
+
+
+def _stats(name):
+    stats = STATS.get(name)
+
+    if stats is None:
+        stats = STATS[name] = HandlerStats()
+
+    return stats
+
+
+def _record(name, took):
+    stats = _stats(name)
+    stats.calls += 1
+    stats.total += took
+    stats.max = max(stats.max, took)
+    LATENCY.observe(took, handler=name)
+
+    if took > SLOW:
+        stats.slow += 1
+        logger.warning(f"slow hook handler {name}: {took * 1000:.1f} ms")
+
+
+def timed(func):
+    """wraps an async hook handler so its latency is recorded while instrumentation is enabled"""
+    name = f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        if not ENABLED:
+            return await func(*args, **kwargs)
+
+        token = _CURRENT.set(name)
+        start = time.perf_counter()
+
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            _record(name, time.perf_counter() - start)
+            _CURRENT.reset(token)
+
+    return wrapper
+
+
+def count(kind):
+    """counts a "socket", "x", or "ipc" call against the hook handler that is running"""
+    if not ENABLED:
+        return
+
+    name = _CURRENT.get()
+    if name:
+        counts = _stats(name).counts
+        counts[kind] = counts.get(kind, 0) + 1
+
+
+def _percentile(name, q):
+    """the upper bound of the histogram bucket that the q-th quantile of name's latency falls in"""
+    counts = LATENCY.counts(handler=name)
+
+    if not counts or not counts[-2]:
+        return None
+
+    target = q * counts[-2]
+    for bound, count in zip(LATENCY.buckets, counts):
+        if count >= target:
+            return bound
+
+    return float("inf")
+
+
+def summary():
+    """returns the latency and call counts of every instrumented handler that has run"""
+    return {
+        name: {
+            "calls": stats.calls,
+            "avg_ms": stats.total / stats.calls * 1000 if stats.calls else 0,
+            "max_ms": stats.max * 1000,
+            "p50_ms": (_percentile(name, 0.5) or 0) * 1000,
+            "p95_ms": (_percentile(name, 0.95) or 0) * 1000,
+            "slow": stats.slow,
+            **stats.counts,
+        }
+        for name, stats in STATS.items()
+    }
+
+
+def log_summary():
+    for name, s in sorted(summary().items(), key=lambda item: -item[1]["avg_ms"]):
+        logger.info(
+            f"hook {name}: {s['calls']} calls, avg {s['avg_ms']:.2f} ms, p95 <= {s['p95_ms']:.1f} ms, "
+            f"max {s['max_ms']:.2f} ms, {s['slow']} slow, socket {s['socket']}, x {s['x']}, ipc {s['ipc']}"
+        )
+
+
+async def _summarize(interval):
+    while ENABLED:
+        await asyncio.sleep(interval)
+        log_summary()
+
+
+_TASKS = set()
+
+
+def init(slow=0.05, interval=300):
+    """
+    turns instrumentation on. should be called from Qtile's main config.py. calls slower than slow
+    seconds are logged, and a summary of every handler goes to the Qtile log every interval seconds
+    (never, if interval is None).
+    """
+    global ENABLED, SLOW
+    ENABLED = True
+    SLOW = slow
+
+    async def start():
+        if interval:
+            task = asyncio.create_task(_summarize(interval))
+            _TASKS.add(task)
+            task.add_done_callback(_TASKS.discard)
+
+    hook.subscribe.startup(start)
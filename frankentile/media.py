@@ -0,0 +1,148 @@
+"""
+media.py
+
+long lived handles on the sound mixer and the media players, so the web api doesn't open a mixer
+or look for a player on every request.
+"""
+
+
+import threading
+from concurrent.futures import Future
+import alsaaudio
+from libqtile.log_utils import logger
+
+
+def _clamp(level):
+    return max(0, min(100, level))
+
+
+class Mixer:
+    """
+    an alsa mixer that's opened on first use and kept open. if the sound device changes under it
+    (ie, headphones get plugged in) alsa errors and the mixer is opened again.
+    """
+    def __init__(self, control="Master", cardindex=-1):
+        self.control = control
+        self.cardindex = cardindex
+        self._mixer = None
+        self._lock = threading.Lock()
+
+    def _do(self, func):
+        with self._lock:
+            if self._mixer is None:
+                self._mixer = alsaaudio.Mixer(self.control, cardindex=self.cardindex)
+
+            try:
+                return func(self._mixer)
+            except alsaaudio.ALSAAudioError as e:
+                logger.info(f"mixer {self.control} failed ({e}), opening it again")
+                self._mixer = alsaaudio.Mixer(self.control, cardindex=self.cardindex)
+                return func(self._mixer)
+
+    def get(self):
+        """the volume in percent"""
+        return self._do(lambda mixer: int(mixer.getvolume()[0]))
+
+    def set(self, level):
+        """sets the volume to level percent (clamped to 0-100) and returns it"""
+        level = _clamp(level)
+        self._do(lambda mixer: mixer.setvolume(level))
+
+        return level
+
+    def adjust(self, step):
+        """changes the volume by step percent and returns the new volume"""
+        def change(mixer):
+            level = _clamp(int(mixer.getvolume()[0]) + step)
+            mixer.setvolume(level)
+            return level
+
+        return self._do(change)
+
+
+class Players:
+    """
+    follows the media players on the session bus with a Playerctl.PlayerManager, which runs on a
+    GLib main loop in its own thread (started on first use). players are managed as they appear and
+    dropped as they vanish, and controls are run on the main loop's thread.
+    """
+    def __init__(self, timeout=2.0):
+        self.timeout = timeout
+        self._manager = None
+        self._error = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+
+    def _run(self):
+        try:
+            from gi import require_version
+            require_version('Playerctl', '2.0')
+            from gi.repository import Playerctl, GLib
+
+            manager = Playerctl.PlayerManager()
+            manager.connect("name-appeared", self._appeared)
+            manager.connect("player-vanished", self._vanished)
+
+            for name in manager.props.player_names:
+                self._appeared(manager, name)
+        except Exception as e:
+            self._error = e
+            self._ready.set()
+            return
+
+        self._GLib = GLib
+        self._manager = manager
+        self._ready.set()
+        GLib.MainLoop().run()
+
+    def _appeared(self, manager, name):
+        from gi.repository import Playerctl
+
+        logger.debug(f"media player {name.name} appeared")
+        manager.manage_player(Playerctl.Player.new_from_name(name))
+
+    def _vanished(self, manager, player):
+        logger.debug(f"media player {player.props.player_name} vanished")
+
+    def _start(self):
+        with self._lock:
+            if not self._ready.is_set():
+                threading.Thread(target=self._run, name="frankentile-players", daemon=True).start()
+                self._ready.wait()
+
+            if self._error:
+                # try again next time, the session bus may not have been up yet.
+                error, self._error = self._error, None
+                self._ready.clear()
+                raise error
+
+    def control(self, command):
+        """
+        runs command ("play", "pause", "play_pause", "next", or "previous") on the most recently
+        started player. returns False if no player is running. raises whatever Playerctl raised,
+        or concurrent.futures.TimeoutError if the main loop doesn't get to it within timeout seconds.
+        """
+        self._start()
+        future = Future()
+
+        def run():
+            try:
+                players = self._manager.props.players
+
+                if players:
+                    getattr(players[0], command)()
+
+                future.set_result(bool(players))
+            except Exception as e:
+                future.set_exception(e)
+
+            # run once
+            return False
+
+        self._GLib.idle_add(run)
+
+        return future.result(self.timeout)
+
+
+MIXER = Mixer()
+PLAYERS = Players()
@@ -0,0 +1,132 @@
+"""
+qtile_ipc.py
+
+a shared client for Qtile's IPC socket, for the processes that control Qtile from outside (the web
+api and the discord bot).
+"""
+
+
+import socket
+import asyncio
+import threading
+from libqtile.ipc import find_sockfile, IPCError, _IPC
+from libqtile.command.graph import CommandGraphRoot
+from libqtile.command.interface import SUCCESS, ERROR
+from libqtile.command.base import CommandError, CommandException
+from . import grafana
+from . import instrument
+
+
+IPC_LATENCY = grafana.histogram("qtile_ipc_seconds", "qtile ipc round trip time")
+
+
+class QtileClient:
+    """
+    sends commands to Qtile in one round trip each. thread safe, one instance is shared per process.
+
+    like auto-desk, Qtile's IPC server answers one command per connection (the client half closes
+    the socket), so there is no connection to keep open between commands. what this saves over
+    InteractiveCommandClient is the extra round trips it makes to check every step of
+    `c.group["1"].toscreen()` and the new event loop it starts for each of them. at most
+    max_in_flight commands are sent at once. if Qtile can't be reached the socket path is resolved
+    again (Qtile may have been restarted) and the command is tried once more.
+    """
+    def __init__(self, path=None, timeout=5.0, max_in_flight=8):
+        self._configured = path
+        self._path = path
+        self.timeout = timeout
+        self.healthy = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+
+    @property
+    def path(self):
+        with self._lock:
+            if self._path is None:
+                self._path = find_sockfile()
+
+            return self._path
+
+    def _reset(self):
+        with self._lock:
+            self._path = self._configured
+
+    @staticmethod
+    def _message(selectors, name, args, kwargs):
+        node = CommandGraphRoot()
+
+        for object_type, selector in selectors:
+            node = node.navigate(object_type, selector)
+
+        call = node.call(name)
+
+        return (call.parent.selectors, call.name, args, kwargs, call.lifted)
+
+    @staticmethod
+    def _result(data):
+        if not data:
+            raise ConnectionResetError("qtile closed the connection without answering")
+
+        (status, result), _ = _IPC.unpack(data)
+
+        if status == SUCCESS:
+            return result
+        if status == ERROR:
+            raise CommandError(result)
+
+        raise CommandException(result)
+
+    def _send(self, payload):
+        instrument.count("ipc")
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.settimeout(self.timeout)
+            s.connect(self.path)
+            s.sendall(payload)
+            s.shutdown(socket.SHUT_WR)
+
+            chunks = []
+            while chunk := s.recv(4096):
+                chunks.append(chunk)
+
+            return b"".join(chunks)
+
+    def _request(self, payload):
+        try:
+            return self._send(payload)
+        except (FileNotFoundError, ConnectionRefusedError):
+            self._reset()
+            return self._send(payload)
+
+    def call(self, selectors, name, *args, **kwargs):
+        """
+        runs the command name on the object selectors point to and returns its result. selectors is
+        a list of (object type, selector) pairs, ie [("group", "1")] for `qtile.group["1"]` or
+        [("window", None)] for the focused window. raises CommandError if the object or command
+        doesn't exist, CommandException if the command failed, and OSError if Qtile can't be reached.
+        """
+        payload = _IPC.pack(self._message(selectors, name, args, kwargs))
+
+        with self._slots, IPC_LATENCY.time(command=name):
+            try:
+                data = self._request(payload)
+            except OSError:
+                self.healthy = False
+                raise
+
+        self.healthy = True
+
+        return self._result(data)
+
+    async def async_call(self, selectors, name, *args, **kwargs):
+        """call, without blocking the event loop"""
+        return await asyncio.to_thread(self.call, selectors, name, *args, **kwargs)
+
+    def check(self):
+        """asks Qtile for its status. returns True if it answered and is ok."""
+        try:
+            return self.call([], "status") == "OK"
+        except (OSError, IPCError, CommandError, CommandException):
+            return False
+
+
+QTILE = QtileClient()
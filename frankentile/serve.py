@@ -0,0 +1,106 @@
+"""
+serve.py
+
+WSGI servers for the web API. the backend is picked by name:
+
+- "threaded" (the default): werkzeug's server with a fixed pool of worker threads and a timeout
+  on stalled requests. slow requests only tie up their own worker. werkzeug closes the connection
+  after every response, so there is no keep-alive.
+- "waitress": the waitress production server, if it's installed. keeps connections alive between
+  requests. falls back to "threaded" if it isn't installed.
+- "dev": werkzeug's server handling one request at a time. only useful for debugging.
+"""
+
+
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+from libqtile.log_utils import logger
+
+
+BACKENDS = ("threaded", "waitress", "dev")
+
+
+class _TimeoutHandler(WSGIRequestHandler):
+    """drops connections that stall (reading the request or writing the response) for the server's request_timeout"""
+    def setup(self):
+        self.timeout = self.server.request_timeout
+        super().setup()
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """werkzeug's server, handing each connection to one of workers threads"""
+    multithread = True
+
+    def __init__(self, host, port, app, workers=8, request_timeout=30):
+        super().__init__(host, port, app, handler=_TimeoutHandler)
+        self.request_timeout = request_timeout
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix="frankentile-web")
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=False)
+
+
+class _WaitressServer:
+    """gives a waitress server the same serve_forever/shutdown interface as werkzeug's"""
+    def __init__(self, server):
+        self.server = server
+        self.server_port = server.effective_port
+
+    def serve_forever(self):
+        self.server.run()
+
+    def shutdown(self):
+        self.server.close()
+
+    def server_close(self):
+        pass
+
+
+def make_server(app, host, port, backend="threaded", workers=8, keep_alive=5, timeout=30):
+    """
+    makes (but doesn't start) a server for app on host:port. workers is the number of requests
+    handled at once, keep_alive how long waitress keeps idle connections open (a stalled request
+    counts as idle there), and timeout how long a request may stall before the threaded backend
+    drops its connection.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown web backend '{backend}'. please use one of {list(BACKENDS)}")
+
+    if backend == "waitress":
+        try:
+            from waitress import create_server
+        except ImportError:
+            logger.error("the waitress backend needs waitress installed, using the threaded backend instead")
+            backend = "threaded"
+        else:
+            return _WaitressServer(
+                create_server(app, host=host, port=port, threads=workers, channel_timeout=keep_alive)
+            )
+
+    if backend == "dev":
+        return BaseWSGIServer(host, port, app)
+
+    return PooledWSGIServer(host, port, app, workers, timeout)
+
+
+def serve(app, host, port, backend="threaded", workers=8, keep_alive=5, timeout=30):
+    """serves app on host:port until the process is stopped"""
+    server = make_server(app, host, port, backend, workers, keep_alive, timeout)
+    logger.warning(f"running web server on {host}:{server.server_port}")
+
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
@@ -0,0 +1,176 @@
+"""
+spool.py
+
+an append only, on disk queue made of segment files. records are written as json lines, read back
+from the last acknowledged position after a restart, and segments are deleted once everything in
+them has been acknowledged.
+"""
+
+
+import os
+import json
+import threading
+from libqtile.log_utils import logger
+
+
+class Spool:
+    """
+    records are appended to the newest segment, which is rolled over once it passes segment_size
+    bytes. appends are flushed to the OS right away (so they survive the process exiting) but never
+    fsynced, that's left to sync(), which is safe to call from another thread so the appending one
+    never waits on the disk. due() says when fsync_every records are waiting for one. if the spool
+    grows past max_bytes the oldest segments are dropped, acknowledged or not.
+
+    positions are (segment, offset) tuples. ack(position) marks everything before position as
+    delivered. records are encoded with dumps, which has to return json.
+    """
+    def __init__(self, path, segment_size=512 * 1024, max_bytes=8 * 1024 * 1024, fsync_every=32, dumps=json.dumps):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.dumps = dumps
+        self.segment_size = segment_size
+        self.max_bytes = max_bytes
+        self.fsync_every = fsync_every
+        self.unsynced = 0
+        # descriptors of rolled over segments that still need an fsync
+        self._retired = []
+        self._lock = threading.Lock()
+        self.acked = self._read_ack()
+
+        segments = self._segments()
+        self.seq = segments[-1] if segments else 0
+        self.file = open(self._segment_path(self.seq), "ab")
+        self.offset = self.file.tell()
+
+        if self.offset and not self._ends_cleanly():
+            # the last write before a crash was torn, don't append to the broken line.
+            self._roll()
+
+    def _segment_path(self, seq):
+        return os.path.join(self.path, f"{seq:012d}.log")
+
+    def _ack_path(self):
+        return os.path.join(self.path, "ack")
+
+    def _segments(self):
+        return sorted(int(name[:-4]) for name in os.listdir(self.path) if name.endswith(".log"))
+
+    def _ends_cleanly(self):
+        with open(self._segment_path(self.seq), "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def _read_ack(self):
+        try:
+            with open(self._ack_path()) as f:
+                seq, offset = f.read().split()
+                return int(seq), int(offset)
+        except (FileNotFoundError, ValueError):
+            return 0, 0
+
+    def _roll(self):
+        self.file.flush()
+        self._retired.append(os.dup(self.file.fileno()))
+        self.file.close()
+        self.seq += 1
+        self.file = open(self._segment_path(self.seq), "ab")
+        self.offset = 0
+        self._enforce_limit()
+
+    def _enforce_limit(self):
+        segments = [(seq, os.path.getsize(self._segment_path(seq))) for seq in self._segments()]
+        total = sum(size for _, size in segments)
+
+        for seq, size in segments[:-1]:
+            if total <= self.max_bytes:
+                break
+
+            logger.warning(f"spool {self.path} is over {self.max_bytes} bytes, dropping segment {seq}")
+            os.remove(self._segment_path(seq))
+            total -= size
+
+    def append(self, record):
+        """writes record to the spool and returns its (start, end) positions"""
+        data = (self.dumps(record) + "\n").encode("utf-8")
+
+        with self._lock:
+            if self.offset and self.offset + len(data) > self.segment_size:
+                self._roll()
+
+            start = (self.seq, self.offset)
+            self.file.write(data)
+            self.file.flush()
+            self.offset += len(data)
+            self.unsynced += 1
+
+            return start, (self.seq, self.offset)
+
+    def due(self):
+        """returns True once fsync_every records are waiting to be synced"""
+        return self.unsynced >= self.fsync_every
+
+    def sync(self):
+        """fsyncs everything appended so far. appends can carry on (from another thread) meanwhile."""
+        with self._lock:
+            if not self.unsynced and not self._retired:
+                return
+
+            # fsync duplicates, so the segments can be rolled over (and closed) while this runs.
+            fds = self._retired + [os.dup(self.file.fileno())]
+            self._retired = []
+            self.unsynced = 0
+
+        for fd in fds:
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def replay(self, since=None):
+        """
+        yields (start, end, record) for every record that hasn't been acknowledged (or every record
+        from the position since), oldest first
+        """
+        ack_seq, ack_offset = max(self.acked, since) if since else self.acked
+
+        for seq in self._segments():
+            if seq < ack_seq:
+                continue
+
+            offset = ack_offset if seq == ack_seq else 0
+
+            with open(self._segment_path(seq), "rb") as f:
+                f.seek(offset)
+
+                for line in f:
+                    end = offset + len(line)
+
+                    try:
+                        record = json.loads(line) if line.endswith(b"\n") else None
+                    except ValueError:
+                        record = None
+
+                    if record is not None:
+                        yield (seq, offset), (seq, end), record
+
+                    offset = end
+
+    def ack(self, position):
+        """marks every record before position as delivered and deletes the segments that are done"""
+        if position <= self.acked:
+            return
+
+        tmp = self._ack_path() + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(f"{position[0]} {position[1]}")
+
+        os.replace(tmp, self._ack_path())
+        self.acked = position
+
+        for seq in self._segments():
+            if seq < position[0]:
+                os.remove(self._segment_path(seq))
+
+    def close(self):
+        self.sync()
+        self.file.close()
@@ -5,52 +5,108 @@ spins up a flask web server to host an api
 """
 
 
-from flask import Flask, send_file, request
+from flask import Flask, Response, request
 import zipfile 
 import io
-from .gen_keybinding_img import make_imgs 
-from .gen_keybinding_img import this_dir as img_dir
+import time
+import json
+from queue import Full
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from .gen_keybinding_img import get_kb_map, keymap_digest, iter_pngs
 from .discord_log import WALLPAPER_PATH
+from . import grafana
+from . import serve
+from . import instrument
+from .broadcast import Broadcaster
 # from threading import Thread
-import shutil
-from multiprocessing import Process 
+from multiprocessing import Process, Queue
 from os.path import expanduser, islink
 import os
+import libqtile
 from libqtile import hook
-from libqtile.log_utils import logger
 from .auto_desk_api import set_layout, find_layout_file
 from os import remove as rm, symlink
 from .tmux import tmux_layout
-from libqtile.command.client import InteractiveCommandClient
-import alsaaudio
-from libqtile.command.base import SelectError, CommandError
-from gi import require_version
-
-# from gi.repository import Playerctl, Gio
+from libqtile.command.base import CommandError
+from .qtile_ipc import QTILE
+from .media import MIXER, PLAYERS
 from gi.repository.GLib import GError
 
 
 app = Flask("frankentile")
 API_HANDLE = None
+KB_CONFIG = expanduser("~/.config/qtile/config.py")
+# processes rendering keybinding sheets that aren't cached yet
+KB_RENDER_WORKERS = os.cpu_count()
+# how many percent /volume/up and /volume/down change the volume by, unless ?step= says otherwise
+VOLUME_STEP = 5
+# the most steps a /batch request may have, and how many of its parallel steps run at once
+MAX_BATCH_STEPS = 32
+BATCH_WORKERS = 4
+_BATCH_POOL = ThreadPoolExecutor(BATCH_WORKERS, thread_name_prefix="frankentile-batch")
+# Qtile's state and window events for /events. EVENTS lives in the web api's process and is fed
+# from _EVENT_QUEUE, which the hooks put on in Qtile's process.
+EVENTS = Broadcaster(state_types=("group", "focus", "volume"))
+# how long an /events stream can be quiet before a keep alive comment is sent, in seconds
+EVENTS_HEARTBEAT = 15
+_EVENT_QUEUE = None
+
+
+class _ZipStream(io.RawIOBase):
+    """a write only, unseekable file that hands back whatever was written to it since the last pop"""
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def pop(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def _stream_zip(files):
+    """builds a zip archive of (name, data) pairs, yielding it chunk by chunk as it is built"""
+    stream = _ZipStream()
+
+    # pngs are already compressed, deflating them again only costs cpu time.
+    with zipfile.ZipFile(stream, "w", zipfile.ZIP_STORED, False) as zip_file:
+        for name, data in files:
+            zip_file.writestr(name, data)
+            yield stream.pop()
+
+    yield stream.pop()
 
 
 @app.route("/key-binds", methods=["GET"])
 def key_binds():
-    """sends back a key bindings image"""
-    try:
-        shutil.rmtree(img_dir)
-    except FileNotFoundError:
-        pass
+    """sends back a zip of the key bindings images"""
+    kb_map = get_kb_map(KB_CONFIG)
+    etag = keymap_digest(kb_map)
+
+    if etag in request.if_none_match:
+        res = Response(status=304)
+    else:
+        res = Response(
+            _stream_zip(iter_pngs(kb_map, processes=KB_RENDER_WORKERS)),
+            mimetype="application/zip",
+            headers={"Content-Disposition": "attachment; filename=keybinds.zip"},
+        )
 
-    images = make_imgs(config_path=expanduser("~/.config/qtile/config.py"))
+    res.set_etag(etag)
 
-    zip_f = os.path.join(img_dir, "keybinds.zip")
+    return res
 
-    with zipfile.ZipFile(zip_f, "w", zipfile.ZIP_DEFLATED, False) as zip_file:
-        for fname in images:
-            zip_file.writestr(fname.split("/")[-1], open(fname, "rb").read())
 
-    return send_file(zip_f, download_name="keybinds.zip", as_attachment=True)
+@app.route("/metrics")
+def metrics():
+    """the web api process' metrics (ie, keybinding render times), for prometheus to scrape"""
+    return Response(grafana.prometheus_text(), mimetype="text/plain; version=0.0.4")
 
 
 @app.route("/wallpaper", methods=["POST"])
@@ -70,8 +126,7 @@ def set_wallpaper():
 @app.route("/auto-desk/layout/<layout>")
 def load_layout(layout):
     """uses auto-desk to load the specified layout"""
-    # TODO: check for layout in "~/.config/auto-desk/layouts/" (ignore spaces, hyphens, and underscores)
-    layout_name = find_layout_file(layout)
+    layout_name = find_layout_file(layout, fuzzy=True)
 
     if layout_name: 
         res = set_layout(layout_name)
@@ -92,11 +147,9 @@ async def tmux(layout):
 @app.route("/focus-on/<group>")
 def focus_on(group: str):
     """changes active focus to the specified group"""
-    c = InteractiveCommandClient()
-    
     try:
-        c.group[group].toscreen()
-    except SelectError:
+        QTILE.call([("group", group)], "toscreen")
+    except CommandError:
         return "no group by that name"
     else:
         return "focus shifted"
@@ -105,10 +158,8 @@ def focus_on(group: str):
 @app.route("/move-to/<group>")
 def move_to(group: str):
     """move current window to group"""
-    c = InteractiveCommandClient()
-    
     try:
-        c.window.togroup(group)
+        QTILE.call([("window", None)], "togroup", group)
     except CommandError:
         return "no group by that name"
     else:
@@ -119,55 +170,56 @@ def move_to(group: str):
 def music(control: str):
     """used to control the music (play/pause/next/etc)"""
     # TODO: make the play command open a player then play (if no player is open)
-    try:
-        require_version('Playerctl', '2.0')
-    except ValueError as e:
-        return f"setting name space return error: {e}"
-
-    from gi.repository import Playerctl
-
-    player = Playerctl.Player()
-
     controls = {
-        "play": player.play, 
-        "pause": player.pause,
-        "play-pause": player.play_pause,
-        "next": player.next,
-        "prev": player.previous,
+        "play": "play",
+        "pause": "pause",
+        "play-pause": "play_pause",
+        "next": "next",
+        "prev": "previous",
     }
 
-    f = controls.get(control)
+    command = controls.get(control)
 
-    if not f:
+    if not command:
         return f"no track control command by the name \"{control}\" found. must be one of, {list(controls.keys())}"
 
     try:
-        f()
-    except GError:
+        controlled = PLAYERS.control(command)
+    except ValueError as e:
+        return f"setting name space return error: {e}"
+    except (GError, TimeoutError):
+        controlled = False
+
+    if not controlled:
         return "track control failed, is there a music player running?"
-    else:
-        return "track controlled succefully"
+
+    return "track controlled succefully"
 
 
 @app.route("/volume/<cmd>")
 def volume(cmd):
-    """adjusts volume"""
-    m = alsaaudio.Mixer()
-    vol = m.getvolume()
-    vol = int(vol[0])
-        
+    """adjusts volume by ?step= percent (VOLUME_STEP by default), or mutes it"""
+    step = request.args.get("step", VOLUME_STEP, type=int)
+
     volumes = {
-        "up": vol + 5,
-        "down": vol - 5,
-        "mute": 0,
+        "up": lambda: MIXER.adjust(step),
+        "down": lambda: MIXER.adjust(-step),
+        "mute": lambda: MIXER.set(0),
         }
 
-    new_vol = volumes.get(cmd)
+    f = volumes.get(cmd)
 
-    if new_vol is None:
+    if f is None:
         return f"\"{cmd}\" is not a valid volume control command. please use one of {list(volumes.keys())}"
 
-    m.setvolume(new_vol)
+    EVENTS.publish({"type": "volume", "volume": f()})
+    return "volume adjusted correctly"
+
+
+@app.route("/volume/set/<int:level>")
+def set_volume(level):
+    """sets the volume to level percent"""
+    EVENTS.publish({"type": "volume", "volume": MIXER.set(level)})
     return "volume adjusted correctly"
 
 
@@ -182,20 +234,196 @@ def sleep():
 @app.route("/config-reload")
 def config_reload():
     """reloads qtile configs"""
-    c = InteractiveCommandClient()
-    c.reload_config()
+    QTILE.call([], "reload_config")
 
     return "configs reloaded succefully"
 
 
-def start_app(host, port):
-    logger.warning("running web server")
-    app.run(host=host, port=port)  # , debug=True, passthrough_errors=True, use_debugger=False, use_reloader=True)
+@app.route("/health")
+def health():
+    """checks that Qtile answers over IPC"""
+    if QTILE.check():
+        return "ok"
+
+    return "qtile is not answering", 503
+
+
+def _run_step(step):
+    """runs one /batch step through the endpoint it names and returns its result"""
+    if isinstance(step, str):
+        step = {"path": step}
+
+    path = step.get("path") if isinstance(step, dict) else None
+
+    if not isinstance(path, str) or not path.startswith("/"):
+        return {"path": path, "status": 400, "result": "a step needs a path starting with /"}
+
+    route = path.split("?", 1)[0].rstrip("/")
+
+    if route == "/batch":
+        return {"path": path, "status": 400, "result": "batches can't be nested"}
+
+    if route == "/events":
+        # checked before dispatching so the step doesn't take up one of the streams.
+        return {"path": path, "status": 400, "result": "event streams can't be batched"}
+
+    method = step.get("method", "GET")
+    data = step.get("data")
+
+    if not isinstance(method, str):
+        return {"path": path, "status": 400, "result": "a step's method has to be a string"}
+
+    if data is not None and not isinstance(data, (dict, str)):
+        return {"path": path, "status": 400, "result": "a step's data has to be an object (form fields) or a string"}
+
+    start = time.perf_counter()
+
+    with app.test_request_context(path, method=method.upper(), data=data):
+        try:
+            res = app.full_dispatch_request()
+        except Exception as e:
+            # what flask does for a request that raised, a 500.
+            res = app.handle_exception(e)
 
+    if res.mimetype == "text/event-stream":
+        # an event stream never ends. (other responses that are streamed, ie flask's error pages or
+        # the /key-binds zip, do.)
+        res.close()
+        return {"path": path, "status": 400, "result": "event streams can't be batched"}
 
-def start_api(host="127.0.0.1", port=8080):
-    """starts the flask server"""
-    p = Process(target=start_app, args=[host, port])
+    try:
+        # binary responses (ie, /key-binds) aren't worth sending back as json.
+        result = res.get_data(as_text=True) if res.mimetype.startswith("text/") or res.is_json else None
+    finally:
+        res.close()
+
+    return {"path": path, "status": res.status_code, "result": result, "ms": (time.perf_counter() - start) * 1000}
+
+
+@app.route("/batch", methods=["POST"])
+def batch():
+    """
+    runs several of the other endpoints in one request. takes a json list of steps (or an object
+    with "steps" and "stop_on_error"), run in order. a step is a path ("/focus-on/2"), an object
+    with a path and optionally a method and form data ({"path": "/wallpaper", "method": "POST",
+    "data": {...}}), or a list of steps that don't depend on each other and are run in parallel.
+    returns the result of every step, in the same shape as the steps. with stop_on_error, steps
+    after one that failed (status 400 or above) are skipped.
+    """
+    body = request.get_json(silent=True)
+    steps = body.get("steps") if isinstance(body, dict) else body
+    stop_on_error = isinstance(body, dict) and body.get("stop_on_error", False)
+
+    if not isinstance(steps, list) or not steps:
+        return {"error": "expected a json list of steps"}, 400
+
+    if sum(len(step) if isinstance(step, list) else 1 for step in steps) > MAX_BATCH_STEPS:
+        return {"error": f"a batch can have at most {MAX_BATCH_STEPS} steps"}, 400
+
+    results = []
+    failed = False
+
+    for step in steps:
+        if failed:
+            res = [{"path": s, "skipped": True} for s in step] if isinstance(step, list) else {"path": step, "skipped": True}
+        elif isinstance(step, list):
+            res = list(_BATCH_POOL.map(_run_step, step))
+            failed = stop_on_error and any(r["status"] >= 400 for r in res)
+        else:
+            res = _run_step(step)
+            failed = stop_on_error and res["status"] >= 400
+
+        results.append(res)
+
+    return {"results": results}
+
+
+def _sse(event_type, data):
+    return f"event: {event_type}\ndata: {json.dumps(data)}\n\n"
+
+
+def _state():
+    state = EVENTS.snapshot()
+
+    if "volume" not in state:
+        try:
+            state["volume"] = {"type": "volume", "volume": MIXER.get()}
+        except Exception:
+            pass
+
+    return state
+
+
+@app.route("/events")
+def events():
+    """
+    streams Qtile's state as server-sent events. a "state" event with the current group, focused
+    window, and volume comes first (and again whenever this stream fell behind and lost events),
+    then "group", "focus", "volume", "window_opened", "window_closed", and "screen_change" events
+    as they happen. every stream holds on to a worker, so at most half the workers stream at once
+    (and none on the dev backend).
+    """
+    sub = EVENTS.subscribe()
+
+    if sub is None:
+        return "too many event streams open", 503
+
+    def stream():
+        try:
+            yield "retry: 3000\n" + _sse("state", _state())
+            dropped = 0
+
+            while True:
+                events = EVENTS.get(sub, EVENTS_HEARTBEAT)
+
+                if sub.dropped != dropped:
+                    dropped = sub.dropped
+                    yield _sse("state", _state())
+
+                if not events:
+                    # lets proxies know the stream is alive, and finds clients that went away.
+                    yield ": keep alive\n\n"
+
+                for event in events:
+                    yield _sse(event["type"], event)
+        finally:
+            EVENTS.unsubscribe(sub)
+
+    res = Response(stream(), mimetype="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    # closing a generator that never started doesn't run its finally.
+    res.call_on_close(lambda: EVENTS.unsubscribe(sub))
+
+    return res
+
+
+def start_app(host, port, backend="threaded", workers=8, keep_alive=5, timeout=30, events=None, render_workers=None):
+    """
+    serves the api. events is the queue Qtile's hooks put /events' events on, render_workers how
+    many processes render keybinding sheets (the number of cpus if None).
+    """
+    global KB_RENDER_WORKERS
+
+    if render_workers:
+        KB_RENDER_WORKERS = render_workers
+
+    if events is not None:
+        EVENTS.pump(events)
+
+    # every stream holds on to a worker. the dev backend has only the one, so it gets no streams.
+    EVENTS.max_subscribers = 0 if backend == "dev" else max(1, workers // 2)
+    serve.serve(app, host, port, backend, workers, keep_alive, timeout)
+
+
+def start_api(
+    host="127.0.0.1", port=8080, backend="threaded", workers=8, keep_alive=5, timeout=30, events=None,
+    render_workers=None,
+):
+    """
+    starts the flask server in its own process. backend is one of serve.BACKENDS, workers is how
+    many requests are handled at once, keep_alive and timeout are in seconds (see serve.make_server),
+    and render_workers is how many processes render keybinding sheets.
+    """
+    p = Process(target=start_app, args=[host, port, backend, workers, keep_alive, timeout, events, render_workers])
     p.start()
     global API_HANDLE
     API_HANDLE = p
@@ -206,9 +434,66 @@ def stop_api():
         API_HANDLE.terminate()
 
 
-def init():
-    hook.subscribe.startup_once(start_api)
+def _push(event):
+    """hands event to the web api's process for /events. never blocks Qtile."""
+    if _EVENT_QUEUE is None:
+        return
+
+    try:
+        _EVENT_QUEUE.put_nowait(event)
+    except Full:
+        # the web api isn't keeping up (or isn't running), drop it.
+        pass
+
+
+def _window(win):
+    return {"window": win.name, "wid": win.wid}
+
+
+@instrument.timed
+async def push_group():
+    _push({"type": "group", "group": libqtile.qtile.current_group.name})
+
+
+@instrument.timed
+async def push_focus(win):
+    _push({"type": "focus", **_window(win)})
+
+
+@instrument.timed
+async def push_window_opened(win):
+    _push({"type": "window_opened", **_window(win)})
+
+
+@instrument.timed
+async def push_window_closed(win):
+    _push({"type": "window_closed", **_window(win)})
+
+
+@instrument.timed
+async def push_screen_change():
+    _push({"type": "screen_change"})
+
+
+def init(host="127.0.0.1", port=8080, backend="threaded", workers=8, keep_alive=5, timeout=30, render_workers=None):
+    """starts the web api when Qtile starts. the arguments are passed on to start_api"""
+    global _EVENT_QUEUE
+    # a config reload calls init again, but the web api (started once) keeps reading the first queue.
+    if _EVENT_QUEUE is None:
+        _EVENT_QUEUE = Queue(maxsize=1000)
+
+    async def start():
+        start_api(host, port, backend, workers, keep_alive, timeout, _EVENT_QUEUE, render_workers)
+        # so /events knows the current group before it first changes.
+        await push_group()
+
+    hook.subscribe.startup_once(start)
     hook.subscribe.shutdown(stop_api)
+    hook.subscribe.setgroup(push_group)
+    hook.subscribe.client_focus(push_focus)
+    hook.subscribe.client_managed(push_window_opened)
+    hook.subscribe.client_killed(push_window_closed)
+    hook.subscribe.screen_change(push_screen_change)
 
 
 if __name__ == "__main__":
@@ -219,7 +504,11 @@ if __name__ == "__main__":
                     description='starts a web server to control Qtile.',
                     )
     parser.add_argument('ip_adr')
+    parser.add_argument('-p', '--port', type=int, default=8080)
+    parser.add_argument('-b', '--backend', choices=serve.BACKENDS, default="threaded")
+    parser.add_argument('-w', '--workers', type=int, default=8)
+    parser.add_argument('-r', '--render-workers', type=int, default=None)
 
     args = parser.parse_args()
 
-    start_app(args.ip_adr, 8080)
+    start_app(args.ip_adr, args.port, args.backend, args.workers, render_workers=args.render_workers)
@@ -0,0 +1,14 @@
+"""
+the tests run against the same stand-ins as the benchmarks: a fake libqtile, and local servers in
+place of discord, auto-desk, and the metrics receiver.
+"""
+
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "benchmarks"))
+
+import fake_qtile  # noqa: E402
+
+fake_qtile.install()
@@ -0,0 +1,126 @@
+"""
+sends log lines through discord_log's Sender and Dispatcher to fake_discord, which rate limits,
+fails, and rejects requests like discord does.
+"""
+
+
+import asyncio
+import pytest
+from types import SimpleNamespace
+from fake_discord import FakeDiscord
+from frankentile import discord_log
+
+
+# long enough that every line goes out as its own message
+LINE = "x" * 1500
+
+
+@pytest.fixture(autouse=True)
+def one_message_per_line(monkeypatch):
+    # otherwise bursts go out as a single attachment and never touch the rate limits.
+    monkeypatch.setattr(discord_log, "ATTACH_AFTER", 1000)
+
+
+def send(discord, lines, max_retries=5):
+    """
+    starts discord, puts lines (a dict of channel: lines) on a Sender, sends them once, and returns
+    what send_all returned, the dispatcher's stats, and the number of requests discord got and
+    messages left queued before the sender was closed (closing flushes again).
+    """
+    async def run():
+        await discord.start()
+        sender = discord_log.Sender(api_base=discord.url)
+        sender.dispatcher.backoff = 0.01
+        sender.dispatcher.max_retries = max_retries
+
+        try:
+            for i in range(max(len(channel_lines) for channel_lines in lines.values())):
+                for channel, channel_lines in lines.items():
+                    if i < len(channel_lines):
+                        sender.put(channel, channel_lines[i])
+
+            sent = await sender.send_all()
+
+            return SimpleNamespace(
+                sent=sent, stats=sender.dispatcher.stats(), requests=discord.requests, queued=len(sender.queue),
+            )
+        finally:
+            await sender.close()
+            await discord.stop()
+
+    return asyncio.run(run())
+
+
+def lines_for(channel, count):
+    return [f"{channel} {i} {LINE}" for i in range(count)]
+
+
+def test_delivers_in_order():
+    discord = FakeDiscord(limit=5, window=0.2)
+    lines = {1: lines_for(1, 12), 2: lines_for(2, 12)}
+
+    res = send(discord, lines)
+
+    assert res.sent
+    for channel, channel_lines in lines.items():
+        assert discord.lines(channel) == channel_lines
+    # the remaining/reset headers keep every request under the limit.
+    assert discord.rate_limited == 0
+    assert res.stats == {"delivered": 24, "retried": 0, "dropped": 0, "deferred": 0}
+
+
+def test_waits_out_429s():
+    # discord doesn't say how much of the limit is left, so the dispatcher runs into it.
+    discord = FakeDiscord(limit=5, window=0.2, rate_limit_headers=False)
+    lines = {1: lines_for(1, 16)}
+
+    res = send(discord, lines)
+
+    assert res.sent
+    assert discord.lines(1) == lines[1]
+    assert discord.rate_limited > 0
+    # after a 429 nothing is sent until Retry-After is up, so there's one 429 per window at most.
+    assert discord.rate_limited <= len(lines[1]) // discord.limit
+    assert res.stats == {
+        "delivered": 16, "retried": discord.rate_limited, "dropped": 0, "deferred": 0,
+    }
+
+
+def test_retries_5xxs():
+    discord = FakeDiscord(limit=100, error_rate=0.4, seed=1)
+    lines = {1: lines_for(1, 10), 2: lines_for(2, 10)}
+
+    res = send(discord, lines, max_retries=20)
+
+    assert res.sent
+    for channel, channel_lines in lines.items():
+        assert discord.lines(channel) == channel_lines
+    assert discord.errors > 0
+    assert res.stats == {"delivered": 20, "retried": discord.errors, "dropped": 0, "deferred": 0}
+
+
+def test_drops_rejected_messages():
+    discord = FakeDiscord(limit=100, missing=[2])
+    lines = {1: lines_for(1, 3), 2: lines_for(2, 3)}
+
+    res = send(discord, lines)
+
+    # rejected messages are dropped, not put back on the queue.
+    assert res.sent
+    assert discord.lines(1) == lines[1]
+    assert discord.lines(2) == []
+    assert res.stats == {"delivered": 3, "retried": 0, "dropped": 3, "deferred": 0}
+
+
+def test_defers_when_retries_run_out():
+    discord = FakeDiscord(limit=100, error_rate=1.0)
+    lines = {1: lines_for(1, 3)}
+
+    res = send(discord, lines, max_retries=2)
+
+    assert not res.sent
+    assert discord.lines(1) == []
+    # the first message used up its retries, the ones after it wait so the channel stays in order.
+    assert res.requests == 3
+    assert res.queued == 3
+    assert res.stats == {"delivered": 0, "retried": 2, "dropped": 0, "deferred": 1}
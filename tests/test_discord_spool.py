@@ -0,0 +1,116 @@
+"""
+checks that what's put on discord_log's Sender is on disk right away, so it's sent after a restart
+even if Qtile went away before the sender flushed it, and that messages past the queue's cap wait on
+disk instead of being dropped.
+"""
+
+
+import asyncio
+from frankentile import discord_log
+from frankentile.spool import Spool
+from fake_discord import FakeDiscord
+
+
+def put_then_restart(path, messages):
+    """puts messages on a spooled Sender that never flushes, then returns a new Sender on the same spool"""
+    async def run():
+        sender = discord_log.Sender(spool=Spool(path, dumps=discord_log._dumps))
+
+        for id, message in messages:
+            sender.put(id, message)
+
+        # Qtile restarts (or exits) before the sender gets to flush.
+        return discord_log.Sender(spool=Spool(path, dumps=discord_log._dumps))
+
+    return asyncio.run(run())
+
+
+def test_events_survive_a_restart(tmp_path):
+    restart = discord_log.Event(discord_log.EventType.restart, {})
+    window = discord_log.Event(discord_log.EventType.new_window, {"name": "term", "pid": 4})
+
+    sender = put_then_restart(tmp_path, [(1, "a line"), (1, restart), (2, window)])
+    replayed = [(id, message if isinstance(message, str) else message.format()) for id, message, _ in sender.queue]
+
+    assert replayed == [(1, "a line"), (1, restart.format()), (2, window.format())]
+
+
+def test_unencodable_payloads_are_spooled_as_errors(tmp_path):
+    event = discord_log.Event(discord_log.EventType.volume, {"level": object()})
+
+    sender = put_then_restart(tmp_path, [(1, event)])
+
+    assert [message for _, message, _ in sender.queue] == [event.format()]
+    assert sender.queue[0][1].startswith("JSON encoding error")
+
+
+def test_overflow_waits_on_disk(tmp_path):
+    async def run():
+        sender = discord_log.Sender(spool=Spool(tmp_path), max_queue=10)
+        sender.dispatcher.max_retries = 0
+        sender.dispatcher.backoff = 0.01
+
+        # discord can't be reached.
+        discord = FakeDiscord(limit=100)
+        sender.api_base = "http://127.0.0.1:9/api/v10"
+
+        for i in range(15):
+            sender.put(1, f"line {i}")
+
+        queued = len(sender.queue)
+        assert not await sender.send_all()
+
+        await discord.start()
+        sender.api_base = discord.url
+
+        try:
+            while sender.queue or sender.spill_from is not None:
+                assert await sender.send_all()
+        finally:
+            await sender.close()
+            await discord.stop()
+
+        left = [message for _, message, _ in discord_log.Sender(spool=Spool(tmp_path)).queue]
+
+        return queued, discord.lines(1), left, sender.overflowed
+
+    queued, delivered, left, overflowed = asyncio.run(run())
+
+    assert queued == 10
+    assert delivered == [f"line {i}" for i in range(15)]
+    assert left == []
+    assert overflowed == 0
+
+
+def test_replay_is_capped(tmp_path):
+    put_then_restart(tmp_path, [(1, f"line {i}") for i in range(15)])
+
+    async def run():
+        sender = discord_log.Sender(spool=Spool(tmp_path), max_queue=10)
+        first = [message for _, message, _ in sender.queue]
+        sender.queue.clear()
+        sender._refill()
+
+        return first, [message for _, message, _ in sender.queue]
+
+    first, rest = asyncio.run(run())
+
+    assert first == [f"line {i}" for i in range(10)]
+    assert rest == [f"line {i}" for i in range(10, 15)]
+
+
+def test_put_back_is_capped_without_a_spool():
+    async def run():
+        sender = discord_log.Sender(max_queue=3)
+
+        for i in range(3):
+            sender.put(1, f"new {i}")
+
+        sender.put_back([(1, "old 0", None), (1, "old 1", None)])
+
+        return [message for _, message, _ in sender.queue], sender.overflowed
+
+    queue, overflowed = asyncio.run(run())
+
+    assert queue == ["new 0", "new 1", "new 2"]
+    assert overflowed == 2
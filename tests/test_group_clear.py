@@ -0,0 +1,83 @@
+"""
+clears groups through auto_desk's GroupClearer against fake_auto_desk, and checks which windows are
+left in the group.
+"""
+
+
+import asyncio
+import fake_qtile
+from fake_auto_desk import FakeAutoDesk
+from frankentile import auto_desk
+
+
+def clear(monkeypatch, steps, clears=("code",), latency=0.001):
+    """
+    runs steps (a coroutine function taking the group and the GroupClearer) against an auto-desk
+    that answers after latency seconds, waits for every clear to finish, and returns (the names of
+    the windows left in the group, the names of the hidden windows, how many requests auto-desk got)
+    """
+    async def run():
+        desk = await FakeAutoDesk(clears=set(clears), latency=latency).start()
+        monkeypatch.setattr(auto_desk.CLIENT, "_path", desk.path)
+        fake_qtile.reset()
+        group = fake_qtile.Group("code")
+        clearer = auto_desk.GroupClearer(delay=0.01)
+
+        try:
+            await steps(group, clearer)
+
+            while clearer.tasks:
+                await asyncio.gather(*clearer.tasks)
+        finally:
+            await desk.stop()
+
+        hidden = fake_qtile.GROUPS.get("hidden")
+
+        return [w.name for w in group.windows], [w.name for w in hidden.windows] if hidden else [], desk.requests
+
+    return asyncio.run(run())
+
+
+def open_window(group, clearer, name, pid):
+    clearer.add(group, fake_qtile.Window((name.lower(), name), pid, group=group))
+
+
+def test_batches_a_burst(monkeypatch):
+    async def steps(group, clearer):
+        fake_qtile.Window(("old", "Old"), 1, group=group)
+
+        for i in range(10):
+            open_window(group, clearer, f"Term{i}", 2)
+
+    kept, hidden, requests = clear(monkeypatch, steps)
+
+    assert kept == [f"Term{i}" for i in range(10)]
+    assert hidden == ["Old"]
+    assert requests == 1
+
+
+def test_keeps_windows_added_while_asking(monkeypatch):
+    async def steps(group, clearer):
+        fake_qtile.Window(("old", "Old"), 1, group=group)
+        open_window(group, clearer, "A", 2)
+        # past the batch's delay, so its should-clear is waiting on auto-desk.
+        await asyncio.sleep(0.02)
+        open_window(group, clearer, "B", 3)
+
+    kept, hidden, requests = clear(monkeypatch, steps, latency=0.03)
+
+    assert kept == ["A", "B"]
+    assert hidden == ["Old"]
+    assert requests == 1
+
+
+def test_leaves_groups_that_should_not_be_cleared(monkeypatch):
+    async def steps(group, clearer):
+        fake_qtile.Window(("old", "Old"), 1, group=group)
+        open_window(group, clearer, "A", 2)
+
+    kept, hidden, requests = clear(monkeypatch, steps, clears=())
+
+    assert kept == ["Old", "A"]
+    assert hidden == []
+    assert requests == 1
@@ -0,0 +1,114 @@
+"""
+records metrics through the grafana module's hooks, then checks what gets pushed to fake_graphite
+and what /metrics serves.
+"""
+
+
+import asyncio
+import pytest
+import fake_qtile
+from fake_graphite import FakeGraphite
+from frankentile import grafana
+
+
+WINDOWS = 30
+
+
+@pytest.fixture(autouse=True)
+def metrics(monkeypatch):
+    # start every test without the metrics other tests (or imports) recorded.
+    monkeypatch.setattr(grafana, "METRICS", {})
+
+
+async def open_windows():
+    for i in range(WINDOWS):
+        await grafana.window_opened(fake_qtile.Window(("term", f"Term{i % 3}"), i))
+        await grafana.group_switched()
+
+
+def opened(batch):
+    """the windows_opened_total lines of batch, summed"""
+    return sum(int(line.split()[1]) for line in batch if ".windows_opened_total." in line)
+
+
+def test_one_batch_per_push():
+    async def run():
+        await open_windows()
+        graphite = await FakeGraphite().start()
+        pusher = grafana.Pusher("127.0.0.1", graphite.port, prefix="test", interval=1)
+
+        await pusher.push()
+        await open_windows()
+        await pusher.push()
+        await graphite.wait_for(2)
+        await graphite.stop()
+
+        return graphite, pusher
+
+    graphite, pusher = asyncio.run(run())
+
+    assert pusher.pushed == 2
+    assert pusher.failed == 0
+    assert len(graphite.batches) == 2
+    # every metric (three wm classes and the group switches) goes out in each batch.
+    assert [len(batch) for batch in graphite.batches] == [4, 4]
+    assert [opened(batch) for batch in graphite.batches] == [WINDOWS, 2 * WINDOWS]
+    assert "test.windows_opened_total.Term0" in " ".join(graphite.batches[0])
+    assert "test.group_switches_total" in " ".join(graphite.batches[0])
+
+
+def test_push_without_graphite():
+    async def run():
+        await open_windows()
+        graphite = await FakeGraphite().start()
+        port = graphite.port
+        await graphite.stop()
+
+        pusher = grafana.Pusher("127.0.0.1", port, interval=1)
+        await pusher.push()
+
+        return pusher
+
+    pusher = asyncio.run(run())
+
+    assert pusher.pushed == 0
+    assert pusher.failed == 1
+
+
+async def get(port, path):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode("latin-1"))
+    data = await reader.read()
+    writer.close()
+
+    return data.decode("utf-8")
+
+
+def test_metrics_endpoint():
+    async def run():
+        await open_windows()
+        latency = grafana.histogram("auto_desk_request_seconds", "auto-desk request latency")
+        latency.observe(0.0005, command="auto-move")
+        latency.observe(0.02, command="auto-move")
+
+        server = await grafana.serve_metrics("127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        responses = await get(port, "/metrics"), await get(port, "/other")
+        server.close()
+        await server.wait_closed()
+
+        return responses
+
+    metrics, other = asyncio.run(run())
+    head, body = metrics.split("\r\n\r\n", 1)
+    lines = body.splitlines()
+
+    assert head.startswith("HTTP/1.1 200")
+    assert "# TYPE auto_desk_request_seconds histogram" in lines
+    assert 'auto_desk_request_seconds_bucket{command="auto-move",le="0.001"} 1' in lines
+    assert 'auto_desk_request_seconds_bucket{command="auto-move",le="0.025"} 2' in lines
+    assert 'auto_desk_request_seconds_bucket{command="auto-move",le="+Inf"} 2' in lines
+    assert 'auto_desk_request_seconds_count{command="auto-move"} 2' in lines
+    assert any(line.startswith('auto_desk_request_seconds_sum{command="auto-move"} 0.0205') for line in lines)
+    assert f'windows_opened_total{{wm_class="Term0"}} {WINDOWS // 3}' in lines
+    assert other.startswith("HTTP/1.1 404")
@@ -0,0 +1,69 @@
+"""
+checks that the spool keeps fsyncs out of append(), and that records survive segment roll overs
+and syncs from another thread.
+"""
+
+
+import os
+import threading
+from frankentile.spool import Spool
+
+
+def test_append_does_not_fsync(tmp_path, monkeypatch):
+    fsyncs = []
+    monkeypatch.setattr(os, "fsync", fsyncs.append)
+    spool = Spool(tmp_path, fsync_every=4)
+
+    for i in range(10):
+        spool.append([1, f"line {i}"])
+
+    assert fsyncs == []
+    assert spool.due()
+
+    spool.sync()
+
+    assert len(fsyncs) == 1
+    assert not spool.due()
+
+    # nothing new to sync.
+    spool.sync()
+    assert len(fsyncs) == 1
+
+
+def test_rolled_over_segments_are_synced(tmp_path, monkeypatch):
+    fsyncs = []
+    monkeypatch.setattr(os, "fsync", fsyncs.append)
+    spool = Spool(tmp_path, segment_size=100)
+
+    for i in range(10):
+        spool.append([1, f"line {i} " + "x" * 40])
+
+    segments = len([name for name in os.listdir(tmp_path) if name.endswith(".log")])
+    spool.sync()
+
+    # one fsync per segment, the rolled over ones were already closed.
+    assert segments > 2
+    assert len(fsyncs) == segments
+
+
+def test_sync_while_appending(tmp_path):
+    spool = Spool(tmp_path, segment_size=2000)
+    done = threading.Event()
+
+    def sync():
+        while not done.is_set():
+            spool.sync()
+
+    thread = threading.Thread(target=sync)
+    thread.start()
+
+    try:
+        for i in range(2000):
+            spool.append([1, f"line {i}"])
+    finally:
+        done.set()
+        thread.join()
+
+    spool.close()
+
+    assert [record[1] for _, _, record in Spool(tmp_path).replay()] == [f"line {i}" for i in range(2000)]
@@ -0,0 +1,70 @@
+"""
+runs /batch requests through flask's test client. needs the web API's dependencies (cairo,
+alsaaudio, playerctl, libtmux), the tests are skipped without them.
+"""
+
+
+import pytest
+
+try:
+    from frankentile import web
+except (ImportError, ValueError, OSError) as e:
+    pytest.skip(f"could not import web: {str(e).splitlines()[0]}", allow_module_level=True)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    def call(selectors, name, *args):
+        if selectors == [("group", "boom")]:
+            raise RuntimeError("qtile blew up")
+
+    monkeypatch.setattr(web.QTILE, "call", call)
+    monkeypatch.setattr(web.EVENTS, "max_subscribers", 1)
+
+    return web.app.test_client()
+
+
+def batch(client, steps):
+    res = client.post("/batch", json=steps)
+    assert res.status_code == 200
+
+    return res.json["results"]
+
+
+def test_statuses_of_steps(client):
+    results = batch(client, [
+        "/focus-on/1",
+        "/no-such",
+        {"path": "/focus-on/1", "method": "POST"},
+        "/focus-on/boom",
+    ])
+
+    assert [step["status"] for step in results] == [200, 404, 405, 500]
+
+
+def test_event_streams_are_not_batched(client):
+    results = batch(client, ["/events", ["/events?since=0", "/focus-on/1"]])
+
+    assert results[0]["status"] == 400
+    assert [step["status"] for step in results[1]] == [400, 200]
+    # none of them took up a stream.
+    assert not web.EVENTS.subscribers
+
+
+def test_malformed_steps(client):
+    results = batch(client, [
+        {"path": "/focus-on/1", "method": 5},
+        {"path": "/focus-on/1", "data": [1]},
+        "focus-on/1",
+        "/batch",
+    ])
+
+    assert [step["status"] for step in results] == [400, 400, 400, 400]
+
+
+def test_stop_on_error(client):
+    res = client.post("/batch", json={"steps": ["/focus-on/1", "/no-such", "/focus-on/2"], "stop_on_error": True})
+    results = res.json["results"]
+
+    assert [step.get("status") for step in results] == [200, 404, None]
+    assert results[2]["skipped"]